@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import AsyncIterator, Awaitable, Callable
+import datetime as dt
+import io
+import tarfile
+import zipfile
+
+from loguru import logger
+
+from app.repositories.storage import StoredObject
+from app.schemas.item import ArchiveFormat
+
+
+@dataclass
+class ArchiveEntry:
+    name: str
+    mtime: dt.datetime
+    open: Callable[[], Awaitable[StoredObject | None]]
+
+
+class _Sink(io.RawIOBase):
+    """Unseekable file collecting written bytes until they are drained"""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def unique_names(entries: list[ArchiveEntry]) -> list[ArchiveEntry]:
+    """Entry names without directories, duplicates get a counter,
+    so the archive unpacks without overwrites or path traversal"""
+    seen: set[str] = set()
+    for entry in entries:
+        name = entry.name.replace("\\", "/").rsplit("/", 1)[-1].lstrip(".") or "file"
+        path = PurePosixPath(name)
+        counter = 1
+        while name in seen:
+            name = f"{path.stem} ({counter}){path.suffix}"
+            counter += 1
+        seen.add(name)
+        entry.name = name
+    return entries
+
+
+async def stream_zip(entries: list[ArchiveEntry]) -> AsyncIterator[bytes]:
+    """ZIP64 archive written on the fly. Files are stored without
+    compression and sizes go to data descriptors, so nothing is buffered
+    beyond a read chunk"""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        for entry in unique_names(entries):
+            stored = await entry.open()
+            if stored is None:
+                logger.warning(f"Archive entry {entry.name} is missing in storage")
+                continue
+            info = zipfile.ZipInfo(entry.name, entry.mtime.timetuple()[:6])
+            with archive.open(info, "w", force_zip64=True) as dest:
+                async for chunk in stored.read(0, None):
+                    dest.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()  # Data descriptor
+    yield sink.drain()  # Central directory
+
+
+async def stream_tar(entries: list[ArchiveEntry]) -> AsyncIterator[bytes]:
+    """POSIX (pax) tar archive, entries of any size and with unicode names"""
+    offset = 0
+    for entry in unique_names(entries):
+        stored = await entry.open()
+        if stored is None:
+            logger.warning(f"Archive entry {entry.name} is missing in storage")
+            continue
+        info = tarfile.TarInfo(entry.name)
+        info.size = stored.size
+        info.mtime = int(entry.mtime.timestamp())
+        info.mode = 0o644
+        header = info.tobuf(format=tarfile.PAX_FORMAT)
+        yield header
+        written = 0
+        async for chunk in stored.read(0, stored.size - 1):
+            written += len(chunk)
+            yield chunk
+        if written < stored.size:  # Keep the archive readable if file shrank
+            yield bytes(stored.size - written)
+        padding = bytes(-stored.size % tarfile.BLOCKSIZE)
+        yield padding
+        offset += len(header) + stored.size + len(padding)
+    # End of archive: two zero blocks, padded to a full record
+    offset += 2 * tarfile.BLOCKSIZE
+    yield bytes(2 * tarfile.BLOCKSIZE + -offset % tarfile.RECORDSIZE)
+
+
+def stream_archive(
+    entries: list[ArchiveEntry], archive_format: ArchiveFormat
+) -> AsyncIterator[bytes]:
+    if archive_format == ArchiveFormat.tar:
+        return stream_tar(entries)
+    return stream_zip(entries)
@@ -1,12 +1,18 @@
+from uuid import uuid4
 import asyncio
 
 from loguru import logger
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from . import profiler
 from .create import settings
+from app.metrics import MeteredQueuePool
+from app.metrics import settings as metrics_settings
 
 DATABASE_URL = (
     f"postgresql+asyncpg://"
@@ -14,9 +20,47 @@ DATABASE_URL = (
     f"@{settings.postgres_host}/{settings.postgres_db}"
 )
 
+
+def get_pool_size() -> int:
+    """Share of the connection budget for this process"""
+    if settings.postgres_pool_size is not None:
+        return settings.postgres_pool_size
+    share = settings.postgres_connection_budget // max(settings.web_concurrency, 1)
+    return max(share - settings.postgres_max_overflow, 1)
+
+
+def get_connect_args() -> dict:
+    connect_args = {
+        "timeout": settings.postgres_connect_timeout,
+        "command_timeout": settings.postgres_command_timeout,
+        # now() is stored in timestamp columns without time zone, the app
+        # reads them as naive UTC whatever the server default is
+        "server_settings": {"timezone": "UTC"},
+    }
+    if settings.postgres_pgbouncer:
+        connect_args |= {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            # Another client may hold the same name on the server connection
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return connect_args
+
+
 engine = create_async_engine(
-    DATABASE_URL, pool_size=20, max_overflow=0, pool_reset_on_return=True, echo=True
+    DATABASE_URL,
+    pool_size=get_pool_size(),
+    max_overflow=settings.postgres_max_overflow,
+    pool_timeout=settings.postgres_pool_timeout,
+    pool_recycle=settings.postgres_pool_recycle,
+    pool_pre_ping=settings.postgres_pool_pre_ping,
+    pool_reset_on_return=True,
+    connect_args=get_connect_args(),
+    poolclass=(
+        MeteredQueuePool if metrics_settings.metrics_enabled else AsyncAdaptedQueuePool
+    ),
 )
+profiler.instrument(engine)
 
 
 class Base(DeclarativeBase):
@@ -35,6 +79,7 @@ async_session = sessionmaker(
 async def init_models():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
     logger.info("Models initialisation is done")
 
@@ -10,6 +10,19 @@ class Settings(BaseSettings):
     postgres_db: str = "db"
     postgres_password: str = "password"
     postgres_user: str = "postgres"
+    # Connections of all processes sharing the settings, split between them
+    postgres_connection_budget: int = 80
+    web_concurrency: int = 1  # Processes, also read by gunicorn as workers count
+    postgres_pool_size: int | None = None  # Overrides the share of the budget
+    postgres_max_overflow: int = 0  # Included in the share of the budget
+    postgres_pool_timeout: float = 10  # Seconds to wait for a free connection
+    postgres_pool_recycle: int = 30 * 60  # Seconds, reconnect older connections
+    postgres_pool_pre_ping: bool = True  # Drop dead connections on checkout
+    postgres_connect_timeout: float = 10  # Seconds
+    postgres_command_timeout: float | None = 60  # Seconds, per statement
+    # For pgbouncer in transaction mode: no cached prepared statements,
+    # statements are prepared under unique names
+    postgres_pgbouncer: bool = False
 
 
 settings = Settings()
@@ -0,0 +1,26 @@
+"""items processing lease
+
+Revision ID: 0a6e4c81d5f2
+Revises: f3b9d2c61e87
+Create Date: 2026-10-18 19:48:05.613472
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0a6e4c81d5f2"
+down_revision = "f3b9d2c61e87"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "items", sa.Column("processing_leased_at", sa.DateTime(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("items", "processing_leased_at")
@@ -0,0 +1,33 @@
+"""items keyset pagination indexes
+
+Revision ID: 5e2b8d94c0a1
+Revises: a41d0c6be87f
+Create Date: 2026-10-18 11:48:05.120937
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "5e2b8d94c0a1"
+down_revision = "a41d0c6be87f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_items_created_at_id", "items", ["created_at", "id"], unique=False
+    )
+    op.create_index(
+        "ix_items_owner_id_created_at_id",
+        "items",
+        ["owner_id", "created_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_items_owner_id_created_at_id", table_name="items")
+    op.drop_index("ix_items_created_at_id", table_name="items")
@@ -0,0 +1,50 @@
+"""content-addressed blobs
+
+Revision ID: a41d0c6be87f
+Revises: 3c1f9a7e52d4
+Create Date: 2026-10-18 11:02:17.844512
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "a41d0c6be87f"
+down_revision = "3c1f9a7e52d4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "blobs",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=True),
+        sa.Column(
+            "ref_count", sa.Integer(), server_default=sa.text("0"), nullable=False
+        ),
+        sa.Column(
+            "created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.Column(
+            "updated_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_blobs_id"), "blobs", ["id"], unique=False)
+    op.add_column("items", sa.Column("blob_id", sa.String(), nullable=True))
+    # Files of existing items are stored under the item id
+    op.execute("INSERT INTO blobs (id, ref_count) SELECT id::text, 1 FROM items")
+    op.execute("UPDATE items SET blob_id = id::text")
+    op.alter_column("items", "blob_id", nullable=False)
+    op.create_index(op.f("ix_items_blob_id"), "items", ["blob_id"], unique=False)
+    op.create_foreign_key(None, "items", "blobs", ["blob_id"], ["id"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("items_blob_id_fkey", "items", type_="foreignkey")
+    op.drop_index(op.f("ix_items_blob_id"), table_name="items")
+    op.drop_column("items", "blob_id")
+    op.drop_index(op.f("ix_blobs_id"), table_name="blobs")
+    op.drop_table("blobs")
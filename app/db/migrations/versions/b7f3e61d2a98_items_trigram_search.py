@@ -0,0 +1,41 @@
+"""items trigram search indexes
+
+Revision ID: b7f3e61d2a98
+Revises: 5e2b8d94c0a1
+Create Date: 2026-10-18 12:20:33.671204
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "b7f3e61d2a98"
+down_revision = "5e2b8d94c0a1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_items_name_trgm",
+        "items",
+        ["name"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_items_filename_trgm",
+        "items",
+        ["filename"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"filename": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_items_filename_trgm", table_name="items")
+    op.drop_index("ix_items_name_trgm", table_name="items")
@@ -0,0 +1,26 @@
+"""compression codecs of blobs and items
+
+Revision ID: c93a1d7e4b56
+Revises: b7f3e61d2a98
+Create Date: 2026-10-18 14:02:11.382945
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "c93a1d7e4b56"
+down_revision = "b7f3e61d2a98"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("blobs", sa.Column("codec", sa.String(), nullable=True))
+    op.add_column("items", sa.Column("codec", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("items", "codec")
+    op.drop_column("blobs", "codec")
@@ -0,0 +1,51 @@
+"""items processing status
+
+Revision ID: d5e8f2a17c03
+Revises: c93a1d7e4b56
+Create Date: 2026-10-18 15:41:27.904316
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "d5e8f2a17c03"
+down_revision = "c93a1d7e4b56"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "items",
+        sa.Column(
+            "processing_status",
+            sa.Enum(
+                "pending",
+                "processing",
+                "done",
+                "failed",
+                name="processingstatus",
+                native_enum=False,
+                length=16,
+            ),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_items_unprocessed_created_at",
+        "items",
+        ["created_at"],
+        unique=False,
+        postgresql_where=sa.text("processing_status IN ('pending', 'processing')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_items_unprocessed_created_at",
+        table_name="items",
+        postgresql_where=sa.text("processing_status IN ('pending', 'processing')"),
+    )
+    op.drop_column("items", "processing_status")
@@ -0,0 +1,53 @@
+"""storage usage
+
+Revision ID: e1a7c4f90b32
+Revises: d5e8f2a17c03
+Create Date: 2026-10-18 17:02:11.518204
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "e1a7c4f90b32"
+down_revision = "d5e8f2a17c03"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("items", sa.Column("size_bytes", sa.BigInteger(), nullable=True))
+    op.add_column("items", sa.Column("content_type", sa.String(), nullable=True))
+    op.add_column(
+        "users",
+        sa.Column(
+            "used_bytes", sa.BigInteger(), server_default=sa.text("0"), nullable=False
+        ),
+    )
+    op.add_column(
+        "users",
+        sa.Column(
+            "item_count", sa.Integer(), server_default=sa.text("0"), nullable=False
+        ),
+    )
+    op.add_column("users", sa.Column("quota_bytes", sa.BigInteger(), nullable=True))
+    # Sizes of legacy blobs are unknown and counted as 0
+    op.execute(
+        "UPDATE items SET size_bytes = blobs.size "
+        "FROM blobs WHERE blobs.id = items.blob_id"
+    )
+    op.execute(
+        "UPDATE users SET used_bytes = usage.used_bytes, item_count = usage.item_count "
+        "FROM (SELECT owner_id, COALESCE(SUM(size_bytes), 0) AS used_bytes, "
+        "COUNT(*) AS item_count FROM items GROUP BY owner_id) AS usage "
+        "WHERE usage.owner_id = users.id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "quota_bytes")
+    op.drop_column("users", "item_count")
+    op.drop_column("users", "used_bytes")
+    op.drop_column("items", "content_type")
+    op.drop_column("items", "size_bytes")
@@ -0,0 +1,34 @@
+"""blobs unreferenced
+
+Revision ID: f3b9d2c61e87
+Revises: e1a7c4f90b32
+Create Date: 2026-10-18 19:12:40.271935
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "f3b9d2c61e87"
+down_revision = "e1a7c4f90b32"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_blobs_unreferenced",
+        "blobs",
+        ["id"],
+        unique=False,
+        postgresql_where=sa.text("ref_count <= 0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_blobs_unreferenced",
+        table_name="blobs",
+        postgresql_where=sa.text("ref_count <= 0"),
+    )
@@ -0,0 +1,116 @@
+"""Query timing from engine events instead of echo logging. Statements over
+the threshold are logged without parameters, and queries are counted per
+request to spot N+1 patterns"""
+
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter
+
+from loguru import logger
+from pydantic_settings import BaseSettings
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import DB_QUERIES_PER_REQUEST, DB_QUERY_DURATION
+
+
+class Settings(BaseSettings):
+    db_slow_query_threshold: float | None = 0.5  # Seconds, None disables the log
+    db_repeated_query_threshold: int = 10  # Executions of one statement per request
+    db_profile_headers: bool = False  # X-DB-* headers, for debugging only
+
+
+settings = Settings()
+
+
+@dataclass
+class QueryProfile:
+    count: int = 0
+    duration: float = 0
+    statements: Counter[str] = field(default_factory=Counter)
+
+    def most_repeated(self) -> tuple[str, int] | None:
+        """Statement executed at least the repeated query threshold times"""
+        if not self.statements:
+            return None
+        statement, count = self.statements.most_common(1)[0]
+        if count < settings.db_repeated_query_threshold:
+            return None
+        return statement, count
+
+
+# Set per request, the engine's greenlets share the context of the caller
+_profile: ContextVar[QueryProfile | None] = ContextVar("query_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = perf_counter() - conn.info["query_start"].pop()
+    DB_QUERY_DURATION.observe(duration)
+    profile = _profile.get()
+    if profile is not None:
+        profile.count += 1
+        profile.duration += duration
+        profile.statements[statement] += 1
+    threshold = settings.db_slow_query_threshold
+    if threshold is not None and duration >= threshold:
+        # Only the statement with placeholders, parameters may hold user data
+        logger.warning(f"Slow query {duration * 1000:.1f} ms: {statement}")
+
+
+def _handle_error(context):
+    # Failed statements don't reach after_cursor_execute
+    starts = context.connection.info.get("query_start") if context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+class QueryProfilerMiddleware:
+    """Counts queries of each request. Queries made after the response
+    started, e.g. while streaming, are logged but miss the headers"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = QueryProfile()
+        token = _profile.set(profile)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and settings.db_profile_headers:
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Query-Count"] = str(profile.count)
+                headers["X-DB-Query-Time"] = f"{profile.duration * 1000:.1f}"
+                repeated = profile.most_repeated()
+                if repeated is not None:
+                    headers["X-DB-N-Plus-One"] = str(repeated[1])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _profile.reset(token)
+            DB_QUERIES_PER_REQUEST.observe(profile.count)
+            repeated = profile.most_repeated()
+            if repeated is not None:
+                statement, count = repeated
+                logger.warning(
+                    f"Possible N+1 in {scope['method']} {scope['path']},"
+                    f" statement executed {count} times: {statement}"
+                )
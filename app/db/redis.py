@@ -1,21 +1,35 @@
 from pydantic_settings import BaseSettings
-from redis.asyncio import ConnectionPool, Redis
+from redis.asyncio import BlockingConnectionPool, Redis
+
+from app.metrics import MeteredConnectionPool
+from app.metrics import settings as metrics_settings
 
 
 class Settings(BaseSettings):
     redis_host: str = "127.0.0.1"
     redis_port: int = 6379
     redis_db: int = 0
+    # Per process. Cache, job queue and rate limits share the pool
+    redis_max_connections: int = 32
+    redis_pool_timeout: float = 2  # Seconds to wait for a free connection
 
 
 settings = Settings()
-pool = ConnectionPool.from_url(
+pool_class = (
+    MeteredConnectionPool
+    if metrics_settings.metrics_enabled
+    else BlockingConnectionPool
+)
+# Blocking pools wait for a free connection, instead of failing at once
+pool = pool_class.from_url(
     f"redis://{settings.redis_host}:{settings.redis_port}/{settings.redis_db + 1}",
-    max_connections=5,
+    max_connections=settings.redis_max_connections,
+    timeout=settings.redis_pool_timeout,
 )
-sensor_pool = ConnectionPool.from_url(
+sensor_pool = pool_class.from_url(
     f"redis://{settings.redis_host}:{settings.redis_port}/{settings.redis_db}",
     max_connections=5,
+    timeout=settings.redis_pool_timeout,
 )
 
 
@@ -1,8 +1,13 @@
+from enum import StrEnum
 import datetime as dt
 import uuid
 from fastapi_users.db import SQLAlchemyBaseUserTable
 
+from sqlalchemy import BigInteger
+from sqlalchemy import Enum
 from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import UniqueConstraint
 from sqlalchemy import text
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import Mapped as M
@@ -44,20 +49,110 @@ class User(SQLAlchemyBaseUserTable[int], Base):
 
     id: M[int] = column(primary_key=True, index=True)
     name: M[str]
+    # Usage counters, maintained with the items of the user
+    used_bytes: M[int] = column(BigInteger, server_default=text("0"))
+    item_count: M[int] = column(server_default=text("0"))
+    quota_bytes: M[int | None] = column(BigInteger, nullable=True)  # Default if null
 
     items: M[list["Item"]] = relationship(
         lazy="noload", back_populates="owner", cascade="all, delete-orphan"
     )
 
 
+class ProcessingStatus(StrEnum):
+    pending = "pending"
+    processing = "processing"
+    done = "done"
+    failed = "failed"
+
+
 class Item(BaseMixin, Base):
+    __table_args__ = (
+        Index("ix_items_created_at_id", "created_at", "id"),
+        Index("ix_items_owner_id_created_at_id", "owner_id", "created_at", "id"),
+        Index(
+            "ix_items_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_items_filename_trgm",
+            "filename",
+            postgresql_using="gin",
+            postgresql_ops={"filename": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_items_unprocessed_created_at",
+            "created_at",
+            postgresql_where=text("processing_status IN ('pending', 'processing')"),
+        ),
+    )
+
     id: M[uuid.UUID] = column(
         primary_key=True, index=True, server_default=text("gen_random_uuid()")
     )
     name: M[str]
     filename: M[str]
     owner_id: M[int] = column(ForeignKey("users.id"))
+    blob_id: M[str] = column(ForeignKey("blobs.id"), index=True)
+    size_bytes: M[int | None] = column(BigInteger, nullable=True)  # Original size
+    content_type: M[str | None] = column(nullable=True)
+    codec: M[str | None] = column(nullable=True)  # Copy of Blob.codec
+    # Null for items stored before background processing
+    processing_status: M[ProcessingStatus | None] = column(
+        Enum(ProcessingStatus, native_enum=False, length=16),
+        nullable=True,
+        default=ProcessingStatus.pending,
+    )
+    # Set when a job claims the item or the sweep enqueues it again, other
+    # jobs of the item are skipped until the lease expires
+    processing_leased_at: M[dt.datetime | None] = column(nullable=True)
 
     owner: M["User"] = relationship(
         lazy="noload", back_populates="items", foreign_keys=[owner_id]
     )
+    blob: M["Blob"] = relationship(lazy="noload", foreign_keys=[blob_id])
+
+
+class Blob(BaseMixin, Base):
+    """Stored content shared by items, addressed by its sha256 digest"""
+
+    __table_args__ = (
+        # Released blobs waiting for their content to be removed
+        Index("ix_blobs_unreferenced", "id", postgresql_where=text("ref_count <= 0")),
+    )
+
+    id: M[str] = column(primary_key=True, index=True)
+    size: M[int | None] = column(BigInteger, nullable=True)  # Unknown for legacy
+    ref_count: M[int] = column(server_default=text("0"))
+    codec: M[str | None] = column(nullable=True)  # Compression of stored file
+
+
+class UploadSession(BaseMixin, Base):
+    id: M[uuid.UUID] = column(
+        primary_key=True, index=True, server_default=text("gen_random_uuid()")
+    )
+    name: M[str]
+    filename: M[str]
+    size: M[int] = column(BigInteger)
+    owner_id: M[int] = column(ForeignKey("users.id", ondelete="CASCADE"))
+    expires_at: M[dt.datetime] = column(index=True)
+
+    chunks: M[list["UploadChunk"]] = relationship(
+        lazy="noload", back_populates="session", cascade="all, delete-orphan"
+    )
+
+
+class UploadChunk(BaseMixin, Base):
+    __table_args__ = (UniqueConstraint("session_id", "offset"),)
+
+    session_id: M[uuid.UUID] = column(
+        ForeignKey("upload_sessions.id", ondelete="CASCADE")
+    )
+    offset: M[int] = column(BigInteger)
+    size: M[int] = column(BigInteger)
+
+    session: M["UploadSession"] = relationship(
+        lazy="noload", back_populates="chunks", foreign_keys=[session_id]
+    )
@@ -1,11 +1,35 @@
-from fastapi import Depends, UploadFile, HTTPException
+from email.utils import parsedate_to_datetime
+import datetime as dt
 
-from app.services.auth import fastapi_users, get_user_manager
+from fastapi import Depends, Header, UploadFile, HTTPException, status
+
+from app.db.tables import User
+from app.repositories.storage import settings as storage_settings
+from app.services.auth import bearer_transport, get_user_manager, user_cache
 from app.services.auth import get_jwt_strategy
 
 _strategy = get_jwt_strategy()
-get_current_user = fastapi_users.current_user(active=True)
-get_current_superuser = fastapi_users.current_user(active=True, superuser=True)
+
+
+def current_user(active: bool = False, superuser: bool = False):
+    """Same checks as fastapi_users.current_user, users are read from the cache"""
+
+    async def dependency(
+        token: str | None = Depends(bearer_transport.scheme),
+        user_manager=Depends(get_user_manager),
+    ) -> User:
+        user = await user_cache.get_user(token, _strategy, user_manager)
+        if user is None or (active and not user.is_active):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+        if superuser and not user.is_superuser:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+        return user
+
+    return dependency
+
+
+get_current_user = current_user(active=True)
+get_current_superuser = current_user(active=True, superuser=True)
 
 
 async def get_current_user_websocket(
@@ -19,6 +43,28 @@ def validate_item(item_raw: UploadFile):
     file_size = item_raw.file.tell()
     item_raw.file.seek(0)
 
-    if file_size > 100 * 1024 * 1024:  # 100 MB
+    if file_size > storage_settings.upload_max_size:
         raise HTTPException(status_code=400, detail="File too large")
     return item_raw
+
+
+def validate_items(items_raw: list[UploadFile]):
+    if len(items_raw) > storage_settings.upload_batch_max_files:
+        raise HTTPException(status_code=400, detail="Too many files")
+    for item_raw in items_raw:
+        validate_item(item_raw)
+    return items_raw
+
+
+def get_unmodified_since(
+    if_unmodified_since: str | None = Header(None),
+) -> dt.datetime | None:
+    """If-Unmodified-Since as naive UTC, like the timestamps in the database.
+    Invalid dates are ignored"""
+    if if_unmodified_since is None:
+        return None
+    try:
+        value = parsedate_to_datetime(if_unmodified_since)
+    except (TypeError, ValueError):
+        return None
+    return value.astimezone(dt.UTC).replace(tzinfo=None)
@@ -6,6 +6,9 @@ from fastapi.responses import JSONResponse
 from pydantic_settings import BaseSettings
 from loguru import logger
 
+from app.metrics import settings as metrics_settings
+from app.repositories.storage import settings as storage_settings
+
 
 class ProjectSettings(BaseSettings):
     LOCAL_MODE: bool = False
@@ -30,9 +33,36 @@ def register_cors(application):
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[
+            "X-Next-Cursor",
+            "ETag",
+            "X-DB-Query-Count",
+            "X-DB-Query-Time",
+            "X-DB-N-Plus-One",
+        ],
     )
 
 
+def register_metrics(application):
+    from app.metrics import MetricsMiddleware
+    from app.routes.metrics import router as metrics_router
+
+    application.add_middleware(MetricsMiddleware)
+    application.include_router(metrics_router)
+
+
+def register_query_profiler(application):
+    from app.db.profiler import QueryProfilerMiddleware
+
+    application.add_middleware(QueryProfilerMiddleware)
+
+
+def register_offload(application):
+    from app.offload import OffloadMiddleware
+
+    application.add_middleware(OffloadMiddleware)
+
+
 def init_web_application():
     project_settings = ProjectSettings()
     application = FastAPI(
@@ -45,9 +75,19 @@ def init_web_application():
 
     from app.routes.item import router as item_router
     from app.routes.auth import router as auth_router
+    from app.routes.upload import router as upload_router
+    from app.routes.download import router as download_router
 
     application.include_router(auth_router)
     application.include_router(item_router)
+    application.include_router(upload_router)
+    application.include_router(download_router)
+
+    if storage_settings.download_offload and storage_settings.download_offload_local:
+        register_offload(application)
+    register_query_profiler(application)
+    if metrics_settings.metrics_enabled:
+        register_metrics(application)
 
     return application
 
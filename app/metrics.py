@@ -0,0 +1,189 @@
+"""Prometheus metrics. Gunicorn workers share them through files in
+PROMETHEUS_MULTIPROC_DIR, see gunicorn.conf.py"""
+
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Iterator
+import os
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client import REGISTRY, generate_latest, multiprocess
+from pydantic_settings import BaseSettings
+from redis.asyncio import BlockingConnectionPool
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class Settings(BaseSettings):
+    metrics_enabled: bool = True
+
+
+settings = Settings()
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response is sent, by route template",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_SIZE = Gauge(
+    "db_pool_size", "Connections kept by the pool", multiprocess_mode="livesum"
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections in use, including overflow",
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Connections opened beyond the pool size",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_seconds",
+    "Time to get a connection, including waiting for a free one and connecting",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts", "Checkouts failed because the pool stayed exhausted"
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Execution time of SQL statements",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed by one request",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+STORAGE_DURATION = Histogram(
+    "storage_operation_duration_seconds",
+    "Latency of storage backend operations, reads until the first chunk",
+    ["backend", "operation"],
+)
+STORAGE_BYTES = Counter(
+    "storage_bytes", "Bytes written to or read from storage", ["direction"]
+)
+REDIS_POOL_IN_USE = Gauge(
+    "redis_pool_in_use",
+    "Redis connections in use",
+    ["db"],
+    multiprocess_mode="livesum",
+)
+REDIS_POOL_IDLE = Gauge(
+    "redis_pool_idle", "Idle Redis connections", ["db"], multiprocess_mode="livesum"
+)
+REDIS_POOL_MAX = Gauge(
+    "redis_pool_max",
+    "Connection limit of the Redis pool",
+    ["db"],
+    multiprocess_mode="livesum",
+)
+
+
+@contextmanager
+def timed(histogram: Histogram) -> Iterator[None]:
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(perf_counter() - start)
+
+
+def collect() -> bytes:
+    """Exposition of all metrics, from every worker in multiprocess mode"""
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+class MetricsMiddleware:
+    """Latency by route template rather than path, so ids don't create
+    new series. Unmatched requests share one label"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            route = scope.get("route")  # Set by the router on match
+            REQUEST_DURATION.labels(
+                method, getattr(route, "path", "unmatched"), str(status_code)
+            ).observe(perf_counter() - start)
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Pool of the async engine with checkout time and usage gauges"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        DB_POOL_SIZE.set(self.size())
+
+    def _update_gauges(self):
+        DB_POOL_CHECKED_OUT.set(self.checkedout())
+        DB_POOL_OVERFLOW.set(max(self.overflow(), 0))
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_DURATION.observe(perf_counter() - start)
+        self._update_gauges()
+        return connection
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._update_gauges()
+
+
+class MeteredConnectionPool(BlockingConnectionPool):
+    """Redis pool with usage gauges, labeled by database number"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._db_label = str(self.connection_kwargs.get("db", 0))
+        REDIS_POOL_MAX.labels(self._db_label).set(self.max_connections)
+
+    def _update_gauges(self):
+        REDIS_POOL_IN_USE.labels(self._db_label).set(len(self._in_use_connections))
+        REDIS_POOL_IDLE.labels(self._db_label).set(len(self._available_connections))
+
+    async def get_connection(self, command_name, *keys, **options):
+        connection = await super().get_connection(command_name, *keys, **options)
+        self._update_gauges()
+        return connection
+
+    async def release(self, connection):
+        await super().release(connection)
+        self._update_gauges()
@@ -0,0 +1,114 @@
+"""Downloads sent by the reverse proxy. The app authorizes the request and
+answers with X-Accel-Redirect (nginx) or X-Sendfile pointing at the stored
+file, the proxy serves the bytes, ranges included"""
+
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.repositories.storage import StoredObject, settings
+from app.repositories.storage.local import LocalStorageBackend
+from app.responses import RangeFileResponse
+
+_HEADERS = {"x-accel-redirect": "X-Accel-Redirect", "x-sendfile": "X-Sendfile"}
+
+
+def get_offload_headers(stored: StoredObject) -> dict[str, str] | None:
+    """Headers handing the download of a local file to the proxy.
+    None when offload is off or the object isn't a file of the storage"""
+    if settings.download_offload is None or stored.path is None:
+        return None
+    header = _HEADERS[settings.download_offload]
+    if settings.download_offload == "x-sendfile":
+        return {header: str(stored.path.resolve())}
+    relative = stored.path.relative_to(settings.storage_path)
+    return {header: settings.download_offload_prefix + quote(relative.as_posix())}
+
+
+def _resolve(header: str, value: str) -> Path | None:
+    """File of an offload header, only files of the storage are served"""
+    root = settings.storage_path.resolve()
+    if header == "x-sendfile":
+        path = Path(value).resolve()
+    elif value.startswith(settings.download_offload_prefix):
+        relative = unquote(value[len(settings.download_offload_prefix) :])
+        path = (root / relative).resolve()
+    else:
+        return None
+    return path if path.is_relative_to(root) else None
+
+
+class OffloadMiddleware:
+    """Local stand-in for the proxy, for development without nginx.
+    Offloaded responses are replaced by the file they point at"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.backend = LocalStorageBackend()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start: Message | None = None
+
+        async def send_wrapper(message: Message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if any(header in headers for header in _HEADERS):
+                    start = message
+                    return
+            if start is None:
+                await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+        if start is not None:
+            await self._send_file(start, scope, receive, send)
+
+    async def _send_file(
+        self, start: Message, scope: Scope, receive: Receive, send: Send
+    ):
+        headers = Headers(raw=start["headers"])
+        header = next(header for header in _HEADERS if header in headers)
+        path = _resolve(header, headers[header])
+        stored = None
+        if path is not None:
+            stored = await run_in_threadpool(self.backend.stat_path, path)
+        if stored is None:
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        skipped = {*_HEADERS, "content-length"}
+        response = RangeFileResponse(
+            stored,
+            status_code=start["status"],
+            headers={k: v for k, v in headers.items() if k not in skipped},
+        )
+        await response(scope, receive, send)
+
+
+class OffloadResponse(RangeFileResponse):
+    """Headers of the download without the body, the proxy sends the file"""
+
+    def __init__(
+        self, stored: StoredObject, offload_headers: dict[str, str], **kwargs
+    ) -> None:
+        super().__init__(stored, **kwargs)
+        self.headers.update(offload_headers)
+        self.headers["content-length"] = "0"
+
+    async def _respond(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self._send_start(send)
+        await send({"type": "http.response.body", "body": b""})
+
+
+def file_response(stored: StoredObject, **kwargs) -> RangeFileResponse:
+    """Offloaded response when possible, otherwise the file is sent by the app"""
+    offload_headers = get_offload_headers(stored)
+    if offload_headers is None:
+        return RangeFileResponse(stored, **kwargs)
+    return OffloadResponse(stored, offload_headers, **kwargs)
@@ -1,5 +1,10 @@
+from typing import Any
 from typing import Self
 from typing import TypedDict
+import base64
+import datetime as dt
+import json
+import uuid
 
 from fastapi import Depends
 from fastapi import HTTPException
@@ -8,11 +13,18 @@ from fastapi import status
 from fastapi.params import Depends as DependsClass
 from loguru import logger
 from pydantic import BaseModel
+from sqlalchemy import case
+from sqlalchemy import ColumnElement
 from sqlalchemy import ColumnOperators
+from sqlalchemy import delete
 from sqlalchemy import exc
-from sqlalchemy import ScalarResult
+from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy import or_
 from sqlalchemy import select
 from sqlalchemy import Select
+from sqlalchemy import tuple_
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy.orm.attributes import InstrumentedAttribute as TableAttr
@@ -35,6 +47,8 @@ type TableAttributesType = (
 
 class BaseRepository[Table: BaseTable]:
     base_table: Table
+    # Unique sort key for keyset pagination, rows are returned in descending order
+    cursor_columns: tuple[str, ...] = ("id",)
 
     def __init__(
         self,
@@ -57,27 +71,76 @@ class BaseRepository[Table: BaseTable]:
         raise NotImplementedError
 
     async def _get_many(
-        self, page: int = 0, count: int = 1000, **filters
-    ) -> ScalarResult[Table]:
-        query = self._get_many_query(page, count, **filters)
-        return await self.session.scalars(query)
+        self,
+        page: int = 0,
+        count: int = 1000,
+        where: list[ColumnElement[bool]] | None = None,
+        **filters,
+    ) -> list[Table]:
+        """Cursor of the next page is returned in X-Next-Cursor header"""
+        query = self._get_many_query(page, count, where=where, **filters)
+        objs = list(await self.session.scalars(query))
+        if len(objs) == count and filters.get("order_by") is None:
+            self.response.headers["X-Next-Cursor"] = self._encode_cursor(objs[-1])
+        return objs
 
     def _get_many_query(
         self,
         page: int = 0,
         count: int = 1000,
         order_by: ColumnOperators | None = None,
+        cursor: str | None = None,
+        where: list[ColumnElement[bool]] | None = None,
         **filters,
     ) -> Select:
-        offset = page * count
+        """Cursor works only with the default ordering,
+        page is ignored when cursor is set"""
         query = select(self.base_table)
         query = self._query_filter(query, **filters)
-        if order_by is None:
-            query = query.order_by(self.base_table.id.desc())
+        if where:
+            query = query.filter(*where)
+        if order_by is not None:
+            return query.order_by(order_by).offset(page * count).limit(count)
+        columns = [getattr(self.base_table, name) for name in self.cursor_columns]
+        query = query.order_by(*(column.desc() for column in columns))
+        if cursor is not None:
+            values = self._decode_cursor(cursor)
+            query = query.filter(tuple_(*columns) < tuple_(*values))
         else:
-            query = query.order_by(order_by)
-        query = query.offset(offset).limit(count)
-        return query
+            query = query.offset(page * count)
+        return query.limit(count)
+
+    def _encode_cursor(self, obj: Table) -> str:
+        values = []
+        for name in self.cursor_columns:
+            value = getattr(obj, name)
+            if isinstance(value, dt.datetime):
+                value = value.isoformat()
+            elif isinstance(value, uuid.UUID):
+                value = str(value)
+            values.append(value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def _decode_cursor(self, cursor: str) -> list[Any]:
+        try:
+            raw_values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(raw_values) != len(self.cursor_columns):
+                raise ValueError
+            values = []
+            for name, value in zip(self.cursor_columns, raw_values):
+                python_type = getattr(self.base_table, name).type.python_type
+                if python_type is dt.datetime:
+                    value = dt.datetime.fromisoformat(value)
+                elif python_type is uuid.UUID:
+                    value = uuid.UUID(value)
+                elif not isinstance(value, python_type):
+                    raise ValueError
+                values.append(value)
+        except (ValueError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+            )
+        return values
 
     @staticmethod
     def _query_select_in_load(
@@ -158,11 +221,59 @@ class BaseRepository[Table: BaseTable]:
         object_schema: BaseModel | None = None,
         write_none: bool = False,
         do_commit: bool = True,
+        unmodified_since: dt.datetime | None = None,
         **kwargs,
     ) -> Table:
-        obj = await self._get_one(id=primary_key)
-        await self._update_obj(obj, object_schema, write_none, do_commit, **kwargs)
-        return await self._get_one(id=primary_key)
+        """One UPDATE ... RETURNING statement. The previous row is locked
+        and joined in FROM, so the statement also tells if any value changed:
+        updated_at is touched only then, otherwise the status is 304.
+        With unmodified_since the row is changed only if it wasn't updated
+        after that time, 412 is raised otherwise"""
+        values = {} if object_schema is None else object_schema.model_dump()
+        values = {
+            key: value
+            for key, value in (values | kwargs).items()
+            if write_none or value is not None
+        }
+        if not values:
+            obj = await self._get_one(id=primary_key)
+            self.response.status_code = status.HTTP_304_NOT_MODIFIED
+            return obj
+
+        table = self.base_table
+        has_updated_at = "updated_at" in table.__table__.c
+        old = select(table.__table__).filter_by(id=primary_key).with_for_update()
+        old = old.cte("old")
+        modified = or_(
+            *(old.c[key].is_distinct_from(value) for key, value in values.items())
+        )
+        if has_updated_at:
+            values["updated_at"] = case((modified, func.now()), else_=old.c.updated_at)
+        query = (
+            update(table)
+            .where(table.id == old.c.id)
+            .values(**values)
+            .returning(table, modified.label("modified"))
+            .execution_options(synchronize_session="fetch", populate_existing=True)
+        )
+        if unmodified_since is not None and has_updated_at:
+            # HTTP dates have a precision of a second
+            last_modified = func.date_trunc("second", old.c.updated_at)
+            query = query.where(last_modified <= unmodified_since)
+
+        row = (await self.session.execute(query)).first()
+        if row is None:
+            if unmodified_since is not None and await self._get_one(
+                id=primary_key, mute_not_found_exception=True
+            ):
+                raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED)
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        obj, is_modified = row
+        if do_commit:
+            await self.commit()
+        if not is_modified:
+            self.response.status_code = status.HTTP_304_NOT_MODIFIED
+        return obj
 
     async def _update_obj(
         self,
@@ -207,14 +318,47 @@ class BaseRepository[Table: BaseTable]:
         self.response.status_code = status.HTTP_201_CREATED
         return model
 
-    async def _delete(self, primary_key: int):
+    async def _create_many(
+        self, rows: list[dict[str, Any]], do_commit: bool = True
+    ) -> list[Table]:
+        """Multi-row INSERT ... RETURNING, batched by the driver"""
+        if not rows:
+            return []
+        query = insert(self.base_table).returning(self.base_table)
+        models = list(await self.session.scalars(query, rows))
+        if do_commit:
+            await self.commit()
+        self.response.status_code = status.HTTP_201_CREATED
+        return models
+
+    async def _delete(self, primary_key: int, do_commit: bool = True) -> Table:
         obj = await self._get_one(id=primary_key)
-        await self._delete_obj(obj)
+        await self._delete_obj(obj, do_commit)
+        return obj
 
-    async def _delete_obj(self, obj: Table):
+    async def _delete_obj(self, obj: Table, do_commit: bool = True):
         await self.session.delete(obj)
-        await self.commit()
+        if do_commit:
+            await self.commit()
+        else:
+            await self.session.flush([obj])
+        self.response.status_code = status.HTTP_204_NO_CONTENT
+
+    async def _delete_many(
+        self, primary_keys: list[Any], do_commit: bool = True
+    ) -> list[Table]:
+        """One DELETE ... RETURNING, missing keys are skipped"""
+        query = (
+            delete(self.base_table)
+            .where(self.base_table.id.in_(primary_keys))
+            .returning(self.base_table)
+            .execution_options(synchronize_session=False)
+        )
+        models = list(await self.session.scalars(query))
+        if do_commit:
+            await self.commit()
         self.response.status_code = status.HTTP_204_NO_CONTENT
+        return models
 
     async def __aenter__(self) -> Self:
         if self.session is None:
@@ -0,0 +1,121 @@
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy import column
+from sqlalchemy import delete
+from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy import values
+from sqlalchemy.dialects.postgresql import insert
+
+from .base import BaseRepository
+from app.db.tables import Blob
+
+
+class BlobRepository(BaseRepository):
+    """Reference counting for content-addressed blobs.
+    Callers commit, so the counter changes with the items referencing blobs"""
+
+    base_table = Blob
+
+    async def acquire(self, blob_id: str, size: int, codec: str | None = None) -> Blob:
+        """Create the blob or add a reference to the existing one.
+        Codec is set only for a new blob, ref_count is 1 then"""
+        query = (
+            insert(Blob)
+            .values(id=blob_id, size=size, ref_count=1, codec=codec)
+            .on_conflict_do_update(
+                index_elements=[Blob.id], set_={"ref_count": Blob.ref_count + 1}
+            )
+            .returning(Blob)
+            .execution_options(populate_existing=True)
+        )
+        return await self.session.scalar(query)
+
+    async def acquire_many(
+        self, blobs: dict[str, tuple[int, int, str | None]]
+    ) -> dict[str, Blob]:
+        """acquire for many blobs at once, blob id -> (size, references, codec).
+        Rows are locked in id order, so concurrent batches don't deadlock"""
+        if not blobs:
+            return {}
+        query = insert(Blob).values(
+            [
+                {"id": blob_id, "size": size, "ref_count": references, "codec": codec}
+                for blob_id, (size, references, codec) in sorted(blobs.items())
+            ]
+        )
+        query = (
+            query.on_conflict_do_update(
+                index_elements=[Blob.id],
+                set_={"ref_count": Blob.ref_count + query.excluded.ref_count},
+            )
+            .returning(Blob)
+            .execution_options(populate_existing=True)
+        )
+        return {blob.id: blob for blob in await self.session.scalars(query)}
+
+    async def set_codec(self, blob_id: str, codec: str | None) -> None:
+        query = update(Blob).where(Blob.id == blob_id).values(codec=codec)
+        await self.session.execute(query)
+
+    async def get_sizes(self, blob_ids: list[str]) -> dict[str, int | None]:
+        """Size of the original content, single query"""
+        query = select(Blob.id, Blob.size).where(Blob.id.in_(blob_ids))
+        return dict((await self.session.execute(query)).tuples())
+
+    async def add_reference(self, blob_id: str) -> bool:
+        """Return False if the blob does not exist"""
+        query = (
+            update(Blob)
+            .where(Blob.id == blob_id, Blob.ref_count > 0)
+            .values(ref_count=Blob.ref_count + 1)
+            .returning(Blob.id)
+        )
+        return await self.session.scalar(query) is not None
+
+    async def release(self, blob_id: str) -> bool:
+        """Drop a reference. Return True if it was the last one. The row is
+        kept without references until purge, so the stored content is
+        removed only after the transaction commits"""
+        query = (
+            update(Blob)
+            .where(Blob.id == blob_id)
+            .values(ref_count=Blob.ref_count - 1)
+            .returning(Blob.ref_count)
+        )
+        ref_count = await self.session.scalar(query)
+        return ref_count is not None and ref_count <= 0
+
+    async def release_many(self, references: dict[str, int]) -> list[str]:
+        """release for many blobs at once, blob id -> dropped references.
+        Return ids of the blobs left without references"""
+        if not references:
+            return []
+        released = values(
+            column("id", String), column("count", Integer), name="released"
+        ).data(sorted(references.items()))
+        query = (
+            update(Blob)
+            .where(Blob.id == released.c.id)
+            .values(ref_count=Blob.ref_count - released.c.count)
+            .returning(Blob.id, Blob.ref_count)
+        )
+        rows = await self.session.execute(query)
+        return [blob_id for blob_id, ref_count in rows if ref_count <= 0]
+
+    async def purge(
+        self, blob_ids: list[str] | None = None, limit: int = 1000
+    ) -> list[str]:
+        """Delete blobs without references, the given ones or any of them.
+        Rows locked by others are skipped, they may be acquired again.
+        Return ids of the deleted blobs, the rows stay locked until commit"""
+        unreferenced = select(Blob.id).where(Blob.ref_count <= 0)
+        if blob_ids is not None:
+            unreferenced = unreferenced.where(Blob.id.in_(blob_ids))
+        unreferenced = (
+            unreferenced.order_by(Blob.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        query = delete(Blob).where(Blob.id.in_(unreferenced)).returning(Blob.id)
+        return list(await self.session.scalars(query))
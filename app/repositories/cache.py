@@ -0,0 +1,205 @@
+from time import monotonic
+from typing import Any, Awaitable, Callable
+from uuid import uuid4
+import asyncio
+import datetime as dt
+import enum
+import json
+import random
+import uuid
+
+from loguru import logger
+from pydantic_settings import BaseSettings
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import RedisError
+from sqlalchemy import inspect
+
+from app.db.base import Base as BaseTable
+from app.db.redis import pool
+
+
+class Settings(BaseSettings):
+    cache_enabled: bool = True
+    cache_ttl: int = 300  # Seconds
+    cache_negative_ttl: int = 30  # Seconds, for not found objects
+    cache_lock_timeout: float = 1  # Seconds to wait for a value loaded elsewhere
+
+
+settings = Settings()
+
+type Row = dict[str, Any]
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Value is written only if the key wasn't invalidated since the load started
+_SET_SCRIPT = """
+if (redis.call("get", KEYS[2]) or "") ~= ARGV[1] then
+    return 0
+end
+return redis.call("set", KEYS[1], ARGV[2], "EX", ARGV[3])
+"""
+
+# Every invalidation bumps the generation. It outlives loads in progress,
+# an expired generation only makes them skip the write
+_INVALIDATE_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    redis.call("del", key)
+    redis.call("incr", key .. ":gen")
+    redis.call("expire", key .. ":gen", ARGV[1])
+end
+return #KEYS
+"""
+
+
+class _LoadInterrupted(Exception):
+    """The task loading a key was cancelled, waiters load it themselves"""
+
+
+class RedisCache:
+    """Read-through cache of JSON values with negative caching.
+    Concurrent misses of a key are loaded once: in-process callers share
+    the pending load and other processes wait for the value under a lock.
+    A load racing an invalidation doesn't write the value it read"""
+
+    lock_poll_interval = 0.02
+
+    def __init__(
+        self,
+        prefix: str,
+        ttl: int = settings.cache_ttl,
+        negative_ttl: int = settings.cache_negative_ttl,
+        connection_pool: ConnectionPool = pool,
+    ):
+        self.prefix = prefix
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.redis = Redis(connection_pool=connection_pool)
+        self._release_lock = self.redis.register_script(_RELEASE_LOCK_SCRIPT)
+        self._set_script = self.redis.register_script(_SET_SCRIPT)
+        self._invalidate = self.redis.register_script(_INVALIDATE_SCRIPT)
+        self._loading: dict[str, asyncio.Future] = {}
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    async def get_or_load(
+        self, key: str, loader: Callable[[], Awaitable[Any | None]]
+    ) -> Any | None:
+        """Loader returns None for not found objects"""
+        if not settings.cache_enabled:
+            return await loader()
+        while (pending := self._loading.get(key)) is not None:
+            try:
+                return await asyncio.shield(pending)
+            except _LoadInterrupted:
+                pass
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await self._get_or_load(key, loader)
+        except BaseException as e:
+            if not isinstance(e, Exception):
+                # Cancellation of this task, waiters aren't cancelled
+                e = _LoadInterrupted()
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved when nobody waits for it
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._loading[key]
+
+    async def _get_or_load(
+        self, key: str, loader: Callable[[], Awaitable[Any | None]]
+    ) -> Any | None:
+        full_key = self._key(key)
+        lock_key = full_key + ":lock"
+        token = uuid4().hex
+        try:
+            cached, generation = await self.redis.mget(full_key, full_key + ":gen")
+            if cached is not None:
+                return json.loads(cached)
+            locked = await self.redis.set(
+                lock_key, token, nx=True, px=int(settings.cache_lock_timeout * 1000)
+            )
+            if not locked:
+                deadline = monotonic() + settings.cache_lock_timeout
+                while monotonic() < deadline:
+                    await asyncio.sleep(self.lock_poll_interval)
+                    cached = await self.redis.get(full_key)
+                    if cached is not None:
+                        return json.loads(cached)
+                return await loader()
+        except RedisError as e:
+            logger.warning(f"Cache is unavailable: {e}")
+            return await loader()
+
+        try:
+            value = await loader()
+            await self._set(full_key, value, generation)
+        finally:
+            try:
+                await self._release_lock(keys=[lock_key], args=[token])
+            except RedisError:
+                pass
+        return value
+
+    async def _set(self, full_key: str, value: Any | None, generation: bytes | None):
+        """Generation of the key read before the value was loaded"""
+        ttl = self.ttl if value is not None else self.negative_ttl
+        ttl += random.randint(0, ttl // 10)  # Jitter, so keys don't expire at once
+        try:
+            await self._set_script(
+                keys=[full_key, full_key + ":gen"],
+                args=[generation or b"", json.dumps(value), ttl],
+            )
+        except RedisError as e:
+            logger.warning(f"Cache is unavailable: {e}")
+
+    async def delete(self, *keys: str):
+        if not keys:
+            return
+        try:
+            await self._invalidate(
+                keys=[self._key(key) for key in keys], args=[self.ttl]
+            )
+        except RedisError as e:
+            logger.warning(f"Cache invalidation failed: {e}")
+
+
+def dump_row(obj: BaseTable) -> Row:
+    """JSON-compatible column values of the object"""
+    row = {}
+    for attr in inspect(type(obj)).column_attrs:
+        value = getattr(obj, attr.key)
+        if isinstance(value, dt.datetime):
+            value = value.isoformat()
+        elif isinstance(value, uuid.UUID):
+            value = str(value)
+        elif isinstance(value, enum.Enum):
+            value = value.value
+        row[attr.key] = value
+    return row
+
+
+def load_row[Table: BaseTable](table: type[Table], row: Row) -> Table:
+    """Build a detached object from dump_row result"""
+    values = {}
+    for attr in inspect(table).column_attrs:
+        value = row.get(attr.key)
+        if value is not None:
+            python_type = attr.columns[0].type.python_type
+            if python_type is dt.datetime:
+                value = dt.datetime.fromisoformat(value)
+            elif python_type is uuid.UUID:
+                value = uuid.UUID(value)
+            elif issubclass(python_type, enum.Enum):
+                value = python_type(value)
+        values[attr.key] = value
+    return table(**values)
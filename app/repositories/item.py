@@ -1,14 +1,53 @@
+from typing import Any
+from uuid import UUID
+import datetime as dt
+
+from fastapi import Depends
+from fastapi import HTTPException
+from fastapi import Response
+from fastapi import status
+from sqlalchemy import ColumnElement
+from sqlalchemy import and_
+from sqlalchemy import func
+from sqlalchemy import literal
+from sqlalchemy import or_
 from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .base import BaseRepository
-from app.db.tables import Item
+from .cache import RedisCache, Row, dump_row, load_row
+from app.db.base import get_session
+from app.db.tables import Item, ProcessingStatus
+from app.schemas.item import ItemSearchMode
 
 
 class ItemRepository(BaseRepository):
     base_table = Item
+    cursor_columns = ("created_at", "id")
+    cache = RedisCache("item")
+
+    def __init__(
+        self,
+        response: Response = Response,
+        session: AsyncSession = Depends(get_session),
+    ):
+        super().__init__(response=response, session=session)
+        self._stale_cache_keys: set[str] = set()
 
-    async def create(self, model: Item) -> Item:
-        return await self._create(model)
+    async def commit(self):
+        await super().commit()
+        if self._stale_cache_keys:
+            await self.cache.delete(*self._stale_cache_keys)
+            self._stale_cache_keys.clear()
+
+    async def create(self, model: Item, do_commit: bool = True) -> Item:
+        return await self._create(model, do_commit=do_commit)
+
+    async def create_many(
+        self, rows: list[dict[str, Any]], do_commit: bool = True
+    ) -> list[Item]:
+        return await self._create_many(rows, do_commit=do_commit)
 
     async def get_one(
         self,
@@ -16,6 +55,13 @@ class ItemRepository(BaseRepository):
         item_email: str | None = None,
         mute_not_found_exception: bool = False,
     ) -> Item:
+        if item_id is not None and item_email is None:
+            row = await self.cache.get_or_load(
+                str(item_id), lambda: self._load_row(item_id)
+            )
+            if row is None and not mute_not_found_exception:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+            return None if row is None else load_row(Item, row)
         filters = {
             k: v for k, v in (("id", item_id), ("email", item_email)) if v is not None
         }
@@ -23,15 +69,159 @@ class ItemRepository(BaseRepository):
             **filters, mute_not_found_exception=mute_not_found_exception
         )
 
+    async def _load_row(self, item_id: int) -> Row | None:
+        obj = await self._get_one(id=item_id, mute_not_found_exception=True)
+        return None if obj is None else dump_row(obj)
+
     async def get_many(self, **filters) -> list[Item]:
         return list(await self._get_many(**filters))
 
-    async def update(self, item_id: int, **fields) -> Item:
-        return await self._update(item_id, **fields)
+    async def get_many_by_ids(self, item_ids: list[UUID]) -> list[Item]:
+        """Single query, missing ids are skipped"""
+        query = select(Item).filter(Item.id.in_(item_ids))
+        return list(await self.session.scalars(query))
 
-    async def delete(self, item_id: int) -> None:
-        await self._delete(item_id)
+    async def update(
+        self, item_id: int, unmodified_since: dt.datetime | None = None, **fields
+    ) -> Item:
+        self._stale_cache_keys.add(str(item_id))
+        return await self._update(item_id, unmodified_since=unmodified_since, **fields)
+
+    async def delete(self, item_id: int, do_commit: bool = True) -> Item:
+        """Return deleted item"""
+        self._stale_cache_keys.add(str(item_id))
+        return await self._delete(item_id, do_commit=do_commit)
+
+    async def delete_many(
+        self, item_ids: list[UUID], do_commit: bool = True
+    ) -> list[Item]:
+        """Return deleted items"""
+        self._stale_cache_keys.update(str(item_id) for item_id in item_ids)
+        return await self._delete_many(item_ids, do_commit=do_commit)
+
+    @staticmethod
+    def _lease_expired(lease: int) -> ColumnElement[bool]:
+        lease_start = func.coalesce(Item.processing_leased_at, Item.created_at)
+        return lease_start < func.now() - dt.timedelta(seconds=lease)
+
+    async def start_processing(self, item_id: UUID, lease: int) -> Item | None:
+        """Claim the item for processing for lease seconds. None if it's
+        deleted, processed or claimed by another job"""
+        self._stale_cache_keys.add(str(item_id))
+        query = (
+            update(Item)
+            .where(Item.id == item_id)
+            .where(
+                or_(
+                    Item.processing_status == ProcessingStatus.pending,
+                    and_(
+                        Item.processing_status == ProcessingStatus.processing,
+                        self._lease_expired(lease),
+                    ),
+                )
+            )
+            .values(
+                processing_status=ProcessingStatus.processing,
+                processing_leased_at=func.now(),
+            )
+            .returning(Item)
+            .execution_options(synchronize_session=False)
+        )
+        item = await self.session.scalar(query)
+        await self.commit()
+        return item
+
+    async def release_processing(self, item_id: UUID):
+        """Give up the claim, so a retry of the job can take the item.
+        The lease is kept, the sweep doesn't enqueue the item meanwhile"""
+        self._stale_cache_keys.add(str(item_id))
+        query = (
+            update(Item)
+            .where(Item.id == item_id)
+            .where(Item.processing_status == ProcessingStatus.processing)
+            .values(
+                processing_status=ProcessingStatus.pending,
+                processing_leased_at=func.now(),
+            )
+        )
+        await self.session.execute(query)
+        await self.commit()
+
+    async def finish_processing(
+        self, item_id: UUID, processing_status: ProcessingStatus
+    ):
+        self._stale_cache_keys.add(str(item_id))
+        query = (
+            update(Item)
+            .where(Item.id == item_id)
+            .where(
+                Item.processing_status.in_(
+                    [ProcessingStatus.pending, ProcessingStatus.processing]
+                )
+            )
+            .values(processing_status=processing_status)
+        )
+        await self.session.execute(query)
+        await self.commit()
+
+    async def lease_unprocessed(self, lease: int, count: int = 1000) -> list[UUID]:
+        """Items whose jobs might be lost: unprocessed ones with an expired
+        lease. Their lease is renewed, so they are returned once per lease"""
+        expired = (
+            select(Item.id)
+            .where(
+                Item.processing_status.in_(
+                    [ProcessingStatus.pending, ProcessingStatus.processing]
+                )
+            )
+            .where(self._lease_expired(lease))
+            .order_by(Item.created_at)
+            .limit(count)
+            .with_for_update(skip_locked=True)
+        )
+        query = (
+            update(Item)
+            .where(Item.id.in_(expired))
+            # Not a change of the item, conditional requests aren't affected
+            .values(processing_leased_at=func.now(), updated_at=Item.updated_at)
+            .returning(Item.id)
+            .execution_options(synchronize_session=False)
+        )
+        item_ids = list(await self.session.scalars(query))
+        await self.commit()
+        return item_ids
 
     async def get_owner_id(self, item_id: int) -> int | None:
-        query = select(Item.owner_id).filter_by(id=item_id)
-        return await self.session.scalar(query)
+        """Served from the cached item metadata"""
+        item = await self.get_one(item_id, mute_not_found_exception=True)
+        return None if item is None else item.owner_id
+
+    async def search(
+        self,
+        text: str,
+        mode: ItemSearchMode,
+        page: int = 0,
+        count: int = 100,
+        where: list[ColumnElement[bool]] | None = None,
+    ) -> list[Item]:
+        """Search by name and filename, served by pg_trgm GIN indexes.
+        Most similar items go first"""
+        columns = (Item.name, Item.filename)
+        if mode == ItemSearchMode.fuzzy:
+            # Word similarity tolerates typos and extra words around the match
+            text_literal = literal(text)
+            condition = or_(*(text_literal.op("<%")(column) for column in columns))
+            rank = func.greatest(
+                *(func.word_similarity(text_literal, column) for column in columns)
+            )
+        else:
+            escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            pattern = escaped + "%" if mode == ItemSearchMode.prefix else f"%{escaped}%"
+            condition = or_(*(column.ilike(pattern) for column in columns))
+            rank = func.greatest(*(func.similarity(column, text) for column in columns))
+        query = select(Item).filter(condition)
+        if where:
+            query = query.filter(*where)
+        query = query.order_by(rank.desc(), Item.created_at.desc(), Item.id.desc())
+        query = query.offset(page * count).limit(count)
+        return list(await self.session.scalars(query))
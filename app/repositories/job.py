@@ -0,0 +1,172 @@
+from dataclasses import dataclass, field
+from time import time
+from typing import Any
+import json
+import random
+
+from pydantic_settings import BaseSettings
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from app.db.redis import pool
+
+
+class Settings(BaseSettings):
+    job_stream: str = "jobs"
+    job_group: str = "workers"
+    job_stream_max_length: int = 100_000  # Approximate, acknowledged jobs are trimmed
+    job_max_attempts: int = 5
+    job_backoff_base: float = 2  # Seconds, doubled with every attempt
+    job_backoff_max: float = 300  # Seconds
+    job_visibility_timeout: int = 60  # Seconds before a job of a dead worker is taken
+    job_batch_size: int = 4  # Jobs a worker runs concurrently
+    job_block_timeout: int = 5  # Seconds to wait for new jobs
+    job_sweep_interval: int = 300  # Seconds between checks for lost jobs
+    job_lease_timeout: int = 15 * 60  # Seconds an item stays claimed by a job
+
+
+settings = Settings()
+
+_MOVE_DUE_SCRIPT = """
+local due = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, ARGV[2])
+for _, member in ipairs(due) do
+    local job = cjson.decode(member)
+    redis.call(
+        "XADD", KEYS[2], "MAXLEN", "~", ARGV[3], "*",
+        "name", job.name, "payload", job.payload, "attempt", job.attempt
+    )
+    redis.call("ZREM", KEYS[1], member)
+end
+return #due
+"""
+
+
+@dataclass
+class Job:
+    id: str
+    name: str
+    payload: dict[str, Any] = field(default_factory=dict)
+    attempt: int = 0
+
+    @classmethod
+    def from_entry(cls, entry_id: bytes, fields: dict[bytes, bytes]) -> "Job":
+        return cls(
+            id=entry_id.decode(),
+            name=fields[b"name"].decode(),
+            payload=json.loads(fields[b"payload"]),
+            attempt=int(fields.get(b"attempt", 0)),
+        )
+
+
+class JobRepository:
+    """Durable job queue on a Redis stream with a consumer group.
+    Failed jobs wait for a retry in a sorted set scored by due time,
+    jobs of dead workers are claimed by others after the visibility timeout"""
+
+    stream = settings.job_stream
+    group = settings.job_group
+    delayed_key = f"{settings.job_stream}:delayed"
+    dead_key = f"{settings.job_stream}:dead"
+
+    def __init__(self):
+        self.redis = Redis(connection_pool=pool)
+        self._move_due = self.redis.register_script(_MOVE_DUE_SCRIPT)
+
+    async def enqueue(self, name: str, *payloads: dict[str, Any]) -> None:
+        """Add a job for every payload"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for payload in payloads:
+                pipe.xadd(
+                    self.stream,
+                    {"name": name, "payload": json.dumps(payload), "attempt": 0},
+                    maxlen=settings.job_stream_max_length,
+                    approximate=True,
+                )
+            await pipe.execute()
+
+    async def ensure_group(self) -> None:
+        try:
+            await self.redis.xgroup_create(
+                self.stream, self.group, id="0", mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def read(self, consumer: str, count: int, block: int) -> list[Job]:
+        """New jobs for the consumer, waits up to block seconds"""
+        response = await self.redis.xreadgroup(
+            self.group, consumer, {self.stream: ">"}, count=count, block=block * 1000
+        )
+        return [
+            Job.from_entry(entry_id, fields)
+            for _, entries in response or []
+            for entry_id, fields in entries
+        ]
+
+    async def claim_stale(self, consumer: str, count: int) -> list[Job]:
+        """Jobs delivered to other consumers and not acknowledged in time"""
+        _, entries, *_ = await self.redis.xautoclaim(
+            self.stream,
+            self.group,
+            consumer,
+            min_idle_time=settings.job_visibility_timeout * 1000,
+            count=count,
+        )
+        return [
+            Job.from_entry(entry_id, fields)
+            for entry_id, fields in entries
+            if fields  # Entries trimmed from the stream have no fields
+        ]
+
+    async def ack(self, job: Job) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, self.group, job.id)
+            pipe.xdel(self.stream, job.id)
+            await pipe.execute()
+
+    async def retry(self, job: Job) -> float:
+        """Schedule the next attempt with exponential backoff and jitter
+        and acknowledge the current one. Return the delay"""
+        delay = min(
+            settings.job_backoff_base * 2**job.attempt, settings.job_backoff_max
+        )
+        delay *= random.uniform(0.5, 1)
+        member = json.dumps(
+            {
+                "name": job.name,
+                "payload": json.dumps(job.payload),
+                "attempt": job.attempt + 1,
+                "id": job.id,  # Keeps members of equal jobs apart
+            }
+        )
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.delayed_key, {member: time() + delay})
+            pipe.xack(self.stream, self.group, job.id)
+            pipe.xdel(self.stream, job.id)
+            await pipe.execute()
+        return delay
+
+    async def bury(self, job: Job) -> None:
+        """Move the job out of the queue after the last attempt"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(
+                self.dead_key,
+                {
+                    "name": job.name,
+                    "payload": json.dumps(job.payload),
+                    "attempt": job.attempt,
+                },
+                maxlen=settings.job_stream_max_length,
+                approximate=True,
+            )
+            pipe.xack(self.stream, self.group, job.id)
+            pipe.xdel(self.stream, job.id)
+            await pipe.execute()
+
+    async def move_due(self, count: int = 100) -> int:
+        """Put jobs due for a retry back to the stream"""
+        return await self._move_due(
+            keys=[self.delayed_key, self.stream],
+            args=[time(), count, settings.job_stream_max_length],
+        )
@@ -0,0 +1,72 @@
+from pydantic_settings import BaseSettings
+from redis.asyncio import Redis
+
+from app.db.redis import pool
+
+
+class Settings(BaseSettings):
+    rate_limit_enabled: bool = True
+    rate_limit_requests: float = 20  # Per second and user
+    rate_limit_requests_burst: int = 100
+    rate_limit_bandwidth: int | None = 50 * 1024 * 1024  # Bytes per second and user
+    rate_limit_bandwidth_burst: int = 100 * 1024 * 1024
+    # Buckets per client address as well. Behind a proxy the address is the
+    # proxy's unless FORWARDED_ALLOW_IPS trusts its X-Forwarded-For
+    rate_limit_per_ip: bool = False
+    rate_limit_ip_factor: float = 4  # IP limits are larger, users share addresses
+
+
+settings = Settings()
+
+# Token buckets refilled from the server clock, so limits hold across nodes.
+# Tokens are taken from all buckets or, without debt, from none of them
+_TAKE_SCRIPT = """
+local amount = tonumber(ARGV[1])
+local debt = ARGV[2] == "1"
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local wait = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local burst = tonumber(ARGV[i * 2 + 2])
+    local bucket = redis.call("HMGET", key, "tokens", "time")
+    local tokens = tonumber(bucket[1]) or burst
+    local elapsed = math.max(now - (tonumber(bucket[2]) or now), 0)
+    tokens = math.min(burst, tokens + elapsed * rate)
+    levels[i] = tokens
+    if tokens < amount then
+        wait = math.max(wait, (amount - tokens) / rate)
+    end
+end
+if wait > 0 and not debt then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local burst = tonumber(ARGV[i * 2 + 2])
+    local tokens = levels[i] - amount
+    redis.call("HSET", key, "tokens", tostring(tokens), "time", tostring(now))
+    redis.call("PEXPIRE", key, math.ceil((burst - tokens) / rate * 1000) + 1000)
+end
+return tostring(wait)
+"""
+
+type Bucket = tuple[str, float, float]  # Key, tokens per second, burst
+
+
+class RateLimitRepository:
+    prefix = "rate"
+
+    def __init__(self):
+        self.redis = Redis(connection_pool=pool)
+        self._take = self.redis.register_script(_TAKE_SCRIPT)
+
+    async def take(self, buckets: list[Bucket], amount: float, debt: bool) -> float:
+        """Take amount of tokens from the buckets. Return seconds until they
+        are available. With debt they are taken anyway, the caller waits"""
+        keys = [f"{self.prefix}:{key}" for key, _, _ in buckets]
+        args = [amount, int(debt)]
+        for _, rate, burst in buckets:
+            args += [rate, burst]
+        return float(await self._take(keys=keys, args=args))
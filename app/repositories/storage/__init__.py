@@ -0,0 +1,3 @@
+from .base import Settings, StorageBackend, StoredObject, settings
+from .codecs import Codec, decompressed
+from .repository import StorageRepository, get_backend
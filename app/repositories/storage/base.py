@@ -0,0 +1,93 @@
+from dataclasses import dataclass, field
+from importlib.util import find_spec
+from pathlib import Path
+from typing import AsyncIterator, Callable, Literal
+
+from pydantic import field_validator
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    storage_backend: Literal["local", "s3", "memory"] = "local"
+    storage_path: Path = Path("files/")
+    storage_fanout_depth: int = 2  # Levels of 2-char directories in local layout
+    storage_write_buffer_size: int = 1024 * 1024  # 1 MB
+    storage_read_buffer_size: int = 1024 * 1024  # 1 MB
+    storage_staging_path: Path = Path("files/.uploads/")
+    storage_compression: Literal["gzip", "zstd"] | None = None  # Off by default
+    storage_compression_level: int | None = None  # Codec default
+    storage_compression_min_size: int = 4 * 1024  # 4 KB
+    storage_compression_min_saving: float = 0.1  # Smaller savings are stored raw
+    download_cache_control: str = "private, no-cache"  # Revalidate with ETag
+    download_link_ttl: int = 5 * 60  # Seconds, default lifetime of signed links
+    download_link_max_ttl: int = 7 * 24 * 60 * 60  # Seconds
+    # Local files are sent by the reverse proxy, the app only sets the header
+    download_offload: Literal["x-accel-redirect", "x-sendfile"] | None = None
+    download_offload_prefix: str = "/_storage/"  # Internal location of nginx
+    download_offload_local: bool = False  # Served by the app, without a proxy
+    storage_user_quota: int | None = None  # Bytes for users without own quota
+    upload_max_size: int = 100 * 1024 * 1024  # 100 MB
+    upload_batch_max_files: int = 1000  # Also the limit of ids in batch requests
+    upload_session_max_size: int = 50 * 1024 * 1024 * 1024  # 50 GB
+    upload_session_ttl: int = 24 * 60 * 60  # Seconds
+    upload_chunk_max_size: int = 64 * 1024 * 1024  # 64 MB
+
+    s3_endpoint_url: str | None = None  # For MinIO and other S3-compatible stores
+    s3_bucket: str = "cloud-storage"
+    s3_region: str | None = None
+    s3_access_key: str | None = None
+    s3_secret_key: str | None = None
+    s3_key_prefix: str = ""
+    s3_part_size: int = 16 * 1024 * 1024  # 16 MB, S3 requires at least 5 MB
+
+    @field_validator("storage_compression")
+    @classmethod
+    def _check_compression(cls, value: str | None) -> str | None:
+        # Fail on start instead of on every upload
+        if value == "zstd" and find_spec("zstandard") is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        return value
+
+
+settings = Settings()
+
+type Reader = Callable[[int, int | None], AsyncIterator[bytes]]
+
+
+@dataclass
+class StoredObject:
+    key: str
+    size: int
+    mtime: float
+    read: Reader = field(repr=False)  # (start, inclusive end) -> chunks
+    path: Path | None = None  # Set when the object is a local file
+    fd: int | None = None  # Open descriptor of the local file, owned by the reader
+
+
+class StorageBackend:
+    """Stores immutable objects by key"""
+
+    async def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    async def stat(self, key: str) -> StoredObject | None:
+        raise NotImplementedError
+
+    async def open(self, key: str) -> StoredObject | None:
+        """Stat for reading. Backends with local files also open the file,
+        so the object can't disappear between the lookup and the read"""
+        return await self.stat(key)
+
+    def read(
+        self, key: str, start: int = 0, end: int | None = None
+    ) -> AsyncIterator[bytes]:
+        """Chunked read of bytes from start to inclusive end"""
+        raise NotImplementedError
+
+    async def store_file(self, key: str, path: Path) -> None:
+        """Store the local file under key. The file is consumed"""
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        """Delete the object, missing objects are ignored"""
+        raise NotImplementedError
@@ -0,0 +1,125 @@
+from enum import StrEnum
+from pathlib import Path
+from typing import Any, AsyncIterator
+import os
+import zlib
+
+from .base import StoredObject, settings
+
+
+class Codec(StrEnum):
+    """Compression of stored content, values are HTTP content codings.
+    zstd requires the zstandard package"""
+
+    gzip = "gzip"
+    zstd = "zstd"
+
+
+def compressor(codec: Codec, level: int | None = None) -> Any:
+    """Object with compress(data) and flush()"""
+    if codec == Codec.zstd:
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=level or 3).compressobj()
+    return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+
+
+class _NeedsInput(Exception):
+    pass
+
+
+class _ChunkSource:
+    """Source of a zstd stream reader, fed one chunk at a time. The reader
+    asks for input only when it has no output, and resumes after
+    _NeedsInput once the next chunk is fed"""
+
+    def __init__(self):
+        self.chunk: bytes | None = None
+
+    def read(self, size: int = -1) -> bytes:
+        if self.chunk is None:
+            raise _NeedsInput
+        chunk, self.chunk = self.chunk, None
+        return chunk
+
+
+async def _inflate_zstd(
+    chunks: AsyncIterator[bytes], chunk_size: int
+) -> AsyncIterator[bytes]:
+    import zstandard
+
+    source = _ChunkSource()
+    reader = zstandard.ZstdDecompressor().stream_reader(source)
+    while True:
+        try:
+            data = reader.read1(chunk_size)
+        except _NeedsInput:
+            source.chunk = await anext(chunks, b"")  # Empty chunk ends the input
+            continue
+        if not data:
+            return
+        yield data
+
+
+async def _inflate_gzip(
+    chunks: AsyncIterator[bytes], chunk_size: int
+) -> AsyncIterator[bytes]:
+    decompress = zlib.decompressobj(31)
+    async for chunk in chunks:
+        while True:
+            data = decompress.decompress(chunk, chunk_size)
+            if data:
+                yield data
+            chunk = decompress.unconsumed_tail
+            # Full output may leave more of it in the decompressor
+            if not chunk and len(data) < chunk_size:
+                break
+
+
+def inflate(
+    chunks: AsyncIterator[bytes], codec: Codec, chunk_size: int
+) -> AsyncIterator[bytes]:
+    """Decompressed chunks of at most chunk_size bytes. The output of one
+    input chunk is limited too, highly compressed data can't be inflated
+    in memory at once"""
+    if codec == Codec.zstd:
+        return _inflate_zstd(chunks, chunk_size)
+    return _inflate_gzip(chunks, chunk_size)
+
+
+def compress_file(
+    source: Path, target: Path, codec: Codec, level: int | None, buffer_size: int
+) -> int:
+    """Return size of the compressed file"""
+    compress = compressor(codec, level)
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        while data := src.read(buffer_size):
+            dst.write(compress.compress(data))
+        dst.write(compress.flush())
+    return os.path.getsize(target)
+
+
+def decompressed(
+    stored: StoredObject,
+    codec: Codec,
+    size: int,
+    chunk_size: int = settings.storage_read_buffer_size,
+) -> StoredObject:
+    """Object with the original content of compressed one. Compressed
+    streams can't be seeked, so a range is decompressed from the start"""
+
+    async def read(start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        offset = 0
+        async for data in inflate(stored.read(0, None), codec, chunk_size):
+            chunk_start, offset = offset, offset + len(data)
+            if offset <= start:
+                continue
+            data = data[max(start - chunk_start, 0) :]
+            if end is not None and offset > end + 1:
+                data = data[: len(data) - (offset - end - 1)]
+            if data:
+                yield data
+            if end is not None and offset > end:
+                return
+
+    return StoredObject(key=stored.key, size=size, mtime=stored.mtime, read=read)
@@ -0,0 +1,124 @@
+from functools import partial
+from pathlib import Path
+from typing import AsyncIterator
+import os
+
+from fastapi.concurrency import run_in_threadpool
+
+from .base import StorageBackend, StoredObject, settings
+
+
+class LocalStorageBackend(StorageBackend):
+    """Files are fanned out by key prefix, ab/cd/abcdef... for depth 2,
+    so no directory holds more than a few thousand entries"""
+
+    def __init__(
+        self,
+        files_path: Path = settings.storage_path,
+        fanout_depth: int = settings.storage_fanout_depth,
+        read_buffer_size: int = settings.storage_read_buffer_size,
+    ):
+        self.files_path = files_path
+        self.fanout_depth = fanout_depth
+        self.read_buffer_size = read_buffer_size
+
+    def path(self, key: str) -> Path:
+        parts = [key[i * 2 : i * 2 + 2] for i in range(self.fanout_depth)]
+        return self.files_path.joinpath(*parts, key)
+
+    def _resolve(self, key: str) -> Path | None:
+        for path in (self.path(key), self.files_path / key):
+            # Files stored before the fan-out layout lie in the root directory
+            if os.path.exists(path):
+                return path
+        return None
+
+    async def exists(self, key: str) -> bool:
+        return await run_in_threadpool(self._resolve, key) is not None
+
+    def _stat(self, key: str) -> StoredObject | None:
+        path = self._resolve(key)
+        if path is None:
+            return None
+        return self.stat_path(path, key)
+
+    def stat_path(self, path: Path, key: str | None = None) -> StoredObject | None:
+        """Object of a file by its path, blocking"""
+        try:
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return StoredObject(
+            key=key or path.name,
+            size=stat_result.st_size,
+            mtime=stat_result.st_mtime,
+            read=partial(self._read_path, path),
+            path=path,
+        )
+
+    async def stat(self, key: str) -> StoredObject | None:
+        return await run_in_threadpool(self._stat, key)
+
+    def _open(self, key: str) -> StoredObject | None:
+        for path in (self.path(key), self.files_path / key):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            stat_result = os.fstat(fd)
+            return StoredObject(
+                key=key,
+                size=stat_result.st_size,
+                mtime=stat_result.st_mtime,
+                read=partial(self._read_path, path),
+                path=path,
+                fd=fd,
+            )
+        return None
+
+    async def open(self, key: str) -> StoredObject | None:
+        """No separate existence check, missing file is found by open itself"""
+        return await run_in_threadpool(self._open, key)
+
+    async def _read_path(
+        self, path: Path, start: int = 0, end: int | None = None
+    ) -> AsyncIterator[bytes]:
+        fd = await run_in_threadpool(os.open, path, os.O_RDONLY)
+        try:
+            offset = start
+            while end is None or offset <= end:
+                size = self.read_buffer_size
+                if end is not None:
+                    size = min(size, end - offset + 1)
+                data = await run_in_threadpool(os.pread, fd, size, offset)
+                if not data:
+                    break
+                offset += len(data)
+                yield data
+        finally:
+            await run_in_threadpool(os.close, fd)
+
+    async def read(
+        self, key: str, start: int = 0, end: int | None = None
+    ) -> AsyncIterator[bytes]:
+        path = await run_in_threadpool(self._resolve, key)
+        if path is None:
+            return
+        async for data in self._read_path(path, start, end):
+            yield data
+
+    def _store_file(self, key: str, path: Path):
+        target = self.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, target)
+
+    async def store_file(self, key: str, path: Path) -> None:
+        await run_in_threadpool(self._store_file, key, path)
+
+    def _delete(self, key: str):
+        path = self._resolve(key)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+    async def delete(self, key: str) -> None:
+        await run_in_threadpool(self._delete, key)
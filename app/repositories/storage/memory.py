@@ -0,0 +1,45 @@
+from functools import partial
+from pathlib import Path
+from typing import AsyncIterator
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from .base import StorageBackend, StoredObject, settings
+
+
+class MemoryStorageBackend(StorageBackend):
+    """Process-local storage for tests"""
+
+    def __init__(self, read_buffer_size: int = settings.storage_read_buffer_size):
+        self.read_buffer_size = read_buffer_size
+        self.objects: dict[str, tuple[bytes, float]] = {}
+
+    async def exists(self, key: str) -> bool:
+        return key in self.objects
+
+    async def stat(self, key: str) -> StoredObject | None:
+        if key not in self.objects:
+            return None
+        data, mtime = self.objects[key]
+        return StoredObject(
+            key=key, size=len(data), mtime=mtime, read=partial(self.read, key)
+        )
+
+    async def read(
+        self, key: str, start: int = 0, end: int | None = None
+    ) -> AsyncIterator[bytes]:
+        if key not in self.objects:
+            return
+        data = self.objects[key][0]
+        end = len(data) - 1 if end is None else min(end, len(data) - 1)
+        for offset in range(start, end + 1, self.read_buffer_size):
+            yield data[offset : min(offset + self.read_buffer_size, end + 1)]
+
+    async def store_file(self, key: str, path: Path) -> None:
+        data = await run_in_threadpool(path.read_bytes)
+        self.objects[key] = (data, time.time())
+        await run_in_threadpool(path.unlink)
+
+    async def delete(self, key: str) -> None:
+        self.objects.pop(key, None)
@@ -0,0 +1,69 @@
+from dataclasses import replace
+from pathlib import Path
+from time import perf_counter
+from typing import AsyncIterator
+
+from .base import Reader, StorageBackend, StoredObject
+from app.metrics import STORAGE_BYTES, STORAGE_DURATION, timed
+
+
+def metered_reader(read: Reader, backend: str) -> Reader:
+    """Count bytes of the reader, latency is the time to the first chunk"""
+
+    async def reader(start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        started = perf_counter()
+        first = True
+        bytes_read = STORAGE_BYTES.labels("read")
+        async for chunk in read(start, end):
+            if first:
+                STORAGE_DURATION.labels(backend, "read").observe(
+                    perf_counter() - started
+                )
+                first = False
+            bytes_read.inc(len(chunk))
+            yield chunk
+
+    return reader
+
+
+class MeteredStorageBackend(StorageBackend):
+    """Wraps a backend with latency and throughput metrics"""
+
+    def __init__(self, backend: StorageBackend, name: str):
+        self.backend = backend
+        self.name = name
+
+    def _timed(self, operation: str):
+        return timed(STORAGE_DURATION.labels(self.name, operation))
+
+    def _metered(self, stored: StoredObject | None) -> StoredObject | None:
+        if stored is None:
+            return None
+        return replace(stored, read=metered_reader(stored.read, self.name))
+
+    async def exists(self, key: str) -> bool:
+        with self._timed("exists"):
+            return await self.backend.exists(key)
+
+    async def stat(self, key: str) -> StoredObject | None:
+        with self._timed("stat"):
+            return self._metered(await self.backend.stat(key))
+
+    async def open(self, key: str) -> StoredObject | None:
+        with self._timed("open"):
+            return self._metered(await self.backend.open(key))
+
+    def read(
+        self, key: str, start: int = 0, end: int | None = None
+    ) -> AsyncIterator[bytes]:
+        return metered_reader(
+            lambda start, end: self.backend.read(key, start, end), self.name
+        )(start, end)
+
+    async def store_file(self, key: str, path: Path) -> None:
+        with self._timed("store"):
+            await self.backend.store_file(key, path)
+
+    async def delete(self, key: str) -> None:
+        with self._timed("delete"):
+            await self.backend.delete(key)
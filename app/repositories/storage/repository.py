@@ -0,0 +1,259 @@
+from functools import cache
+from mimetypes import guess_type
+from pathlib import Path
+from string import ascii_lowercase
+from typing import AsyncIterator, BinaryIO
+import hashlib
+import random
+import os
+import shutil
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from .base import StorageBackend, StoredObject, settings
+from .codecs import Codec, compress_file
+from .metered import MeteredStorageBackend
+from app.metrics import STORAGE_BYTES
+from app.metrics import settings as metrics_settings
+
+_COMPRESSED_MEDIA = ("image/", "video/", "audio/", "font/")
+_COMPRESSED_MEDIA_TYPES = {
+    "application/gzip",
+    "application/pdf",
+    "application/vnd.rar",
+    "application/x-7z-compressed",
+    "application/x-bzip2",
+    "application/x-rar-compressed",
+    "application/x-xz",
+    "application/zip",
+    "application/zstd",
+}
+
+
+@cache
+def get_backend() -> StorageBackend:
+    """Backend is shared by the process, it holds clients and memory storage"""
+    if settings.storage_backend == "s3":
+        from .s3 import S3StorageBackend
+
+        backend = S3StorageBackend()
+    elif settings.storage_backend == "memory":
+        from .memory import MemoryStorageBackend
+
+        backend = MemoryStorageBackend()
+    else:
+        from .local import LocalStorageBackend
+
+        backend = LocalStorageBackend()
+    if metrics_settings.metrics_enabled:
+        backend = MeteredStorageBackend(backend, settings.storage_backend)
+    return backend
+
+
+class StorageRepository:
+    """Uploads are staged on the local disk, then handed to the backend"""
+
+    filename_length = 32
+    write_buffer_size = settings.storage_write_buffer_size
+    read_buffer_size = settings.storage_read_buffer_size
+    staging_path = settings.storage_staging_path
+
+    def __init__(self):
+        self.backend = get_backend()
+
+    def _generate_filename(self) -> str:
+        return "".join(
+            random.choices(ascii_lowercase + "0123456789", k=self.filename_length)
+        )
+
+    async def is_stored(self, filename: str) -> bool:
+        return await self.backend.exists(filename)
+
+    async def stat(self, filename: str) -> StoredObject | None:
+        return await self.backend.stat(filename)
+
+    async def open(self, filename: str) -> StoredObject | None:
+        return await self.backend.open(filename)
+
+    def _store(self, raw: BinaryIO, name: str):
+        self.staging_path.mkdir(parents=True, exist_ok=True)
+        with open(self.staging_path / name, "wb") as f:
+            shutil.copyfileobj(raw, f, self.write_buffer_size)
+
+    async def create(self, raw: BinaryIO, filename: str) -> str:
+        """Return filename"""
+        name = self._generate_filename()
+        await run_in_threadpool(self._store, raw, name)
+        await self.backend.store_file(filename, self.staging_path / name)
+        return filename
+
+    def get(
+        self, filename: str, start: int = 0, end: int | None = None
+    ) -> AsyncIterator[bytes]:
+        """Chunked read"""
+        return self.backend.read(filename, start, end)
+
+    async def delete(self, filename: str):
+        await self.backend.delete(filename)
+
+    def _ingest(self, raw: BinaryIO, name: str, limit: int | None) -> tuple[str, int]:
+        self.staging_path.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(self.staging_path / name, "wb") as f:
+                while data := raw.read(self.write_buffer_size):
+                    size += len(data)
+                    if limit is not None and size > limit:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail="Storage quota exceeded",
+                        )
+                    digest.update(data)
+                    f.write(data)
+                    STORAGE_BYTES.labels("write").inc(len(data))
+        except BaseException:
+            (self.staging_path / name).unlink(missing_ok=True)
+            raise
+        return digest.hexdigest(), size
+
+    async def ingest(
+        self, raw: BinaryIO, limit: int | None = None
+    ) -> tuple[str, str, int]:
+        """Copy raw to a staging file, hashing the content on the fly.
+        Copying stops with 413 once limit is exceeded.
+        Return staging name, sha256 digest and size"""
+        name = self._generate_filename()
+        digest, size = await run_in_threadpool(self._ingest, raw, name, limit)
+        return name, digest, size
+
+    def _digest(self, path: Path) -> tuple[str, int]:
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            while data := f.read(self.read_buffer_size):
+                digest.update(data)
+                size += len(data)
+        return digest.hexdigest(), size
+
+    async def digest_staging(self, name: str) -> tuple[str, int]:
+        """Return sha256 digest and size of the staging file"""
+        return await run_in_threadpool(self._digest, self.staging_path / name)
+
+    def _allocate_staging(self, name: str, size: int):
+        self.staging_path.mkdir(parents=True, exist_ok=True)
+        with open(self.staging_path / name, "wb") as f:
+            f.truncate(size)  # Sparse file, blocks are allocated on write
+
+    async def create_staging(self, name: str, size: int):
+        """Allocate a staging file for chunked uploads"""
+        await run_in_threadpool(self._allocate_staging, name, size)
+
+    async def write_staging(
+        self, name: str, offset: int, stream: AsyncIterator[bytes], limit: int
+    ) -> int:
+        """Write stream to the staging file from offset.
+        Return count of written bytes"""
+        fd = await run_in_threadpool(os.open, self.staging_path / name, os.O_WRONLY)
+        written = 0
+        buffer = bytearray()
+        try:
+            async for data in stream:
+                if written + len(buffer) + len(data) > limit:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail="Chunk exceeds upload size",
+                    )
+                buffer += data
+                if len(buffer) >= self.write_buffer_size:
+                    await run_in_threadpool(os.pwrite, fd, buffer, offset + written)
+                    written += len(buffer)
+                    STORAGE_BYTES.labels("write").inc(len(buffer))
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(os.pwrite, fd, buffer, offset + written)
+                written += len(buffer)
+                STORAGE_BYTES.labels("write").inc(len(buffer))
+        finally:
+            await run_in_threadpool(os.close, fd)
+        return written
+
+    @staticmethod
+    def guess_content_type(filename: str | None, declared: str | None = None) -> str:
+        """Type declared by the client unless it's generic, otherwise
+        guessed from the file extension"""
+        if declared and declared != "application/octet-stream":
+            return declared
+        return guess_type(filename or "")[0] or "application/octet-stream"
+
+    @staticmethod
+    def choose_codec(filename: str | None, size: int) -> Codec | None:
+        """Codec for new content, already compressed formats are stored raw"""
+        if settings.storage_compression is None:
+            return None
+        if size < settings.storage_compression_min_size:
+            return None
+        media_type, encoding = guess_type(filename or "")
+        if encoding is not None or media_type in _COMPRESSED_MEDIA_TYPES:
+            return None
+        if (media_type or "").startswith(_COMPRESSED_MEDIA) and not (
+            media_type.endswith("+xml")  # SVG
+        ):
+            return None
+        return Codec(settings.storage_compression)
+
+    def _compress(self, path: Path, codec: Codec) -> Path | None:
+        """Compressed copy of the file, None when that saves too little"""
+        target = path.with_name(path.name + ".z")
+        try:
+            compressed_size = compress_file(
+                path,
+                target,
+                codec,
+                settings.storage_compression_level,
+                self.read_buffer_size,
+            )
+        except BaseException:
+            target.unlink(missing_ok=True)
+            raise
+        saving = 1 - compressed_size / max(os.path.getsize(path), 1)
+        if saving < settings.storage_compression_min_saving:
+            target.unlink()
+            return None
+        return target
+
+    @staticmethod
+    def _link(path: Path) -> Path:
+        """Second name of the file for the backend to consume"""
+        target = path.with_name(path.name + ".s")
+        target.unlink(missing_ok=True)  # Left by an interrupted commit
+        try:
+            os.link(path, target)
+        except OSError:  # No hard links on the file system
+            shutil.copyfile(path, target)
+        return target
+
+    async def commit_staging(
+        self, name: str, filename: str, codec: Codec | None = None
+    ) -> Codec | None:
+        """Store the staging file, replacing the stored file.
+        With codec the file is compressed first, unless that saves too little.
+        The staging file is kept, callers delete it once the database commits.
+        Return codec of the stored file"""
+        path = self.staging_path / name
+        stored_path = None
+        if codec is not None:
+            stored_path = await run_in_threadpool(self._compress, path, codec)
+        if stored_path is None:
+            codec = None
+            stored_path = await run_in_threadpool(self._link, path)
+        try:
+            await self.backend.store_file(filename, stored_path)
+        except BaseException:
+            await run_in_threadpool(stored_path.unlink, True)
+            raise
+        return codec
+
+    async def delete_staging(self, name: str):
+        await run_in_threadpool((self.staging_path / name).unlink, True)
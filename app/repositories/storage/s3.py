@@ -0,0 +1,148 @@
+from contextlib import AsyncExitStack
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO
+import asyncio
+
+from fastapi.concurrency import run_in_threadpool
+
+from .base import StorageBackend, StoredObject, settings
+
+
+class S3StorageBackend(StorageBackend):
+    """S3-compatible object storage (AWS, MinIO, Ceph RGW...).
+    Requires aiobotocore, which is imported only when the backend is used"""
+
+    def __init__(
+        self,
+        bucket: str = settings.s3_bucket,
+        key_prefix: str = settings.s3_key_prefix,
+        part_size: int = settings.s3_part_size,
+        read_buffer_size: int = settings.storage_read_buffer_size,
+    ):
+        self.bucket = bucket
+        self.key_prefix = key_prefix
+        self.part_size = part_size
+        self.read_buffer_size = read_buffer_size
+        self._client = None
+        self._client_lock = asyncio.Lock()
+        self._exit_stack = AsyncExitStack()
+
+    async def client(self) -> Any:
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    from aiobotocore.session import get_session
+
+                    self._client = await self._exit_stack.enter_async_context(
+                        get_session().create_client(
+                            "s3",
+                            endpoint_url=settings.s3_endpoint_url,
+                            region_name=settings.s3_region,
+                            aws_access_key_id=settings.s3_access_key,
+                            aws_secret_access_key=settings.s3_secret_key,
+                        )
+                    )
+        return self._client
+
+    async def close(self):
+        await self._exit_stack.aclose()
+        self._client = None
+
+    def _key(self, key: str) -> str:
+        return self.key_prefix + key
+
+    @staticmethod
+    def _is_not_found(error: Exception) -> bool:
+        response = getattr(error, "response", None) or {}
+        return response.get("Error", {}).get("Code") in ("404", "NoSuchKey")
+
+    async def _head(self, key: str) -> dict | None:
+        client = await self.client()
+        try:
+            return await client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except Exception as e:
+            if self._is_not_found(e):
+                return None
+            raise
+
+    async def exists(self, key: str) -> bool:
+        return await self._head(key) is not None
+
+    async def stat(self, key: str) -> StoredObject | None:
+        head = await self._head(key)
+        if head is None:
+            return None
+        return StoredObject(
+            key=key,
+            size=head["ContentLength"],
+            mtime=head["LastModified"].timestamp(),
+            read=partial(self.read, key),
+        )
+
+    async def read(
+        self, key: str, start: int = 0, end: int | None = None
+    ) -> AsyncIterator[bytes]:
+        client = await self.client()
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        try:
+            response = await client.get_object(
+                Bucket=self.bucket, Key=self._key(key), Range=byte_range
+            )
+        except Exception as e:
+            if self._is_not_found(e):
+                return
+            raise
+        async with response["Body"] as body:
+            while data := await body.read(self.read_buffer_size):
+                yield data
+
+    async def store_file(self, key: str, path: Path) -> None:
+        size = (await run_in_threadpool(path.stat)).st_size
+        f: BinaryIO = await run_in_threadpool(open, path, "rb")
+        try:
+            if size <= self.part_size:
+                data = await run_in_threadpool(f.read)
+                client = await self.client()
+                await client.put_object(
+                    Bucket=self.bucket, Key=self._key(key), Body=data
+                )
+            else:
+                await self._store_multipart(key, f)
+        finally:
+            await run_in_threadpool(f.close)
+        await run_in_threadpool(path.unlink)
+
+    async def _store_multipart(self, key: str, f: BinaryIO):
+        """Streams the file part by part, only one part is held in memory"""
+        client = await self.client()
+        upload = await client.create_multipart_upload(
+            Bucket=self.bucket, Key=self._key(key)
+        )
+        upload_id = upload["UploadId"]
+        parts = []
+        try:
+            while data := await run_in_threadpool(f.read, self.part_size):
+                part = await client.upload_part(
+                    Bucket=self.bucket,
+                    Key=self._key(key),
+                    PartNumber=len(parts) + 1,
+                    UploadId=upload_id,
+                    Body=data,
+                )
+                parts.append({"ETag": part["ETag"], "PartNumber": len(parts) + 1})
+            await client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self._key(key),
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            await client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self._key(key), UploadId=upload_id
+            )
+            raise
+
+    async def delete(self, key: str) -> None:
+        client = await self.client()
+        await client.delete_object(Bucket=self.bucket, Key=self._key(key))
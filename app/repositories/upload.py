@@ -0,0 +1,89 @@
+import datetime as dt
+from uuid import UUID
+
+from fastapi import HTTPException
+from fastapi import status
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from .base import BaseRepository
+from app.db.tables import UploadChunk
+from app.db.tables import UploadSession
+
+
+class UploadSessionRepository(BaseRepository):
+    base_table = UploadSession
+
+    async def create(self, ttl: dt.timedelta, **fields) -> UploadSession:
+        model = UploadSession(expires_at=func.now() + ttl, **fields)
+        model = await self._create(model)
+        await self.session.refresh(model)
+        return model
+
+    async def get_one(
+        self,
+        session_id: UUID,
+        mute_not_found_exception: bool = False,
+        for_update: bool = False,
+    ) -> UploadSession:
+        """Return only not expired session"""
+        query = self._filter(id=session_id).filter(
+            UploadSession.expires_at > func.now()
+        )
+        if for_update:
+            query = query.with_for_update()
+        obj = await self.session.scalar(query)
+        if obj is None and not mute_not_found_exception:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        return obj
+
+    async def get_owner_id(self, session_id: UUID) -> int | None:
+        query = select(UploadSession.owner_id).filter_by(id=session_id)
+        return await self.session.scalar(query)
+
+    async def delete(self, session_id: UUID, do_commit: bool = True) -> None:
+        await self.session.execute(delete(UploadSession).filter_by(id=session_id))
+        if do_commit:
+            await self.commit()
+
+    async def delete_expired(self) -> list[UUID]:
+        """Return ids of deleted sessions"""
+        query = (
+            delete(UploadSession)
+            .where(UploadSession.expires_at <= func.now())
+            .returning(UploadSession.id)
+        )
+        session_ids = list(await self.session.scalars(query))
+        await self.commit()
+        return session_ids
+
+    async def add_chunk(self, session_id: UUID, offset: int, size: int):
+        """Idempotent, repeated chunk overwrites the previous one"""
+        query = (
+            insert(UploadChunk)
+            .values(session_id=session_id, offset=offset, size=size)
+            .on_conflict_do_update(
+                index_elements=[UploadChunk.session_id, UploadChunk.offset],
+                set_={"size": size, "updated_at": func.now()},
+            )
+        )
+        await self.session.execute(query)
+        await self.commit()
+
+    async def get_received_ranges(self, session_id: UUID) -> list[tuple[int, int]]:
+        """Return merged [start, end) ranges of received chunks"""
+        query = (
+            select(UploadChunk.offset, UploadChunk.size)
+            .filter_by(session_id=session_id)
+            .order_by(UploadChunk.offset)
+        )
+        ranges: list[tuple[int, int]] = []
+        for offset, size in await self.session.execute(query):
+            end = offset + size
+            if ranges and offset <= ranges[-1][1]:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+            elif size > 0:
+                ranges.append((offset, end))
+        return ranges
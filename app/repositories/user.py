@@ -1,4 +1,10 @@
+from fastapi import HTTPException, status
+from sqlalchemy import BigInteger
+from sqlalchemy import func
+from sqlalchemy import literal
+from sqlalchemy import or_
 from sqlalchemy import select
+from sqlalchemy import update
 
 from .base import BaseRepository
 from app.db.tables import User
@@ -27,6 +33,7 @@ class UserRepository(BaseRepository):
         return list(await self._get_many(**filters))
 
     async def update(self, user_id: int, **fields) -> User:
+        """Users have no updated_at, so there is no optimistic check"""
         return await self._update(user_id, **fields)
 
     async def delete(self, user_id: int) -> None:
@@ -35,3 +42,39 @@ class UserRepository(BaseRepository):
     async def get_owner_id(self, user_id: int) -> int | None:
         query = select(User.owner_id).filter_by(id=user_id)
         return await self.session.scalar(query)
+
+    async def get_usage(self, user_id: int) -> User:
+        """Usage counters only, by primary key"""
+        query = select(User.used_bytes, User.item_count, User.quota_bytes).filter_by(
+            id=user_id
+        )
+        row = (await self.session.execute(query)).one_or_none()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        return User(id=user_id, **row._asdict())
+
+    async def charge(
+        self,
+        user_id: int,
+        size_bytes: int,
+        item_count: int,
+        default_quota: int | None = None,
+    ) -> bool:
+        """Add to the usage counters in one statement, increases are applied
+        only within the quota. Return False if the quota would be exceeded.
+        The row stays locked until commit"""
+        quota = func.coalesce(User.quota_bytes, literal(default_quota, BigInteger))
+        query = (
+            update(User)
+            .where(User.id == user_id)
+            .values(
+                used_bytes=User.used_bytes + size_bytes,
+                item_count=User.item_count + item_count,
+            )
+            .returning(User.id)
+        )
+        if size_bytes > 0:
+            query = query.where(
+                or_(quota.is_(None), User.used_bytes + size_bytes <= quota)
+            )
+        return await self.session.scalar(query) is not None
@@ -0,0 +1,366 @@
+import hashlib
+import os
+import typing
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from secrets import token_hex
+from urllib.parse import quote
+
+import anyio
+from starlette.background import BackgroundTask
+from starlette.datastructures import Headers
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app.archive import ArchiveEntry, stream_archive
+from app.metrics import STORAGE_BYTES
+from app.repositories.storage import StoredObject
+from app.schemas.item import ArchiveFormat
+from app.services.rate_limit import Throttle
+
+type ByteRange = tuple[int, int]
+
+
+def is_not_modified(
+    request_headers: Headers, response_headers: typing.Mapping[str, str]
+) -> bool:
+    """Evaluate If-None-Match or, without it, If-Modified-Since"""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etag = response_headers.get("etag")
+        # Weak comparison, as required for GET and HEAD
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag is not None and etag.removeprefix("W/") in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    last_modified = response_headers.get("last-modified")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(
+            if_modified_since
+        )
+    except (TypeError, ValueError):
+        return False
+
+
+def accepts_encoding(accept_encoding: str | None, coding: str) -> bool:
+    """Whether the Accept-Encoding header allows the content coding.
+    An entry of the coding itself takes precedence over *"""
+    if not accept_encoding:
+        return False
+    qualities: dict[str, float] = {}
+    for value in accept_encoding.split(","):
+        name, *params = value.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, number = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0
+        qualities[name.strip().lower()] = quality
+    return qualities.get(coding, qualities.get("*", 0)) > 0
+
+
+class RangeFileResponse(Response):
+    """Response for a stored object with HTTP Range (single and multipart)
+    and If-Range. Local files are sent zero-copy through the
+    ``http.response.zerocopysend`` ASGI extension when the server provides it
+    and the response isn't throttled"""
+
+    chunk_size = 1024 * 1024
+    max_ranges = 16
+
+    def __init__(
+        self,
+        stored: StoredObject,
+        status_code: int = 200,
+        headers: typing.Mapping[str, str] | None = None,
+        media_type: str | None = None,
+        background: BackgroundTask | None = None,
+        filename: str | None = None,
+        content_disposition_type: str = "attachment",
+        throttle: Throttle | None = None,
+    ) -> None:
+        self.stored = stored
+        self.throttle = throttle
+        self.status_code = status_code
+        if media_type is None:
+            media_type = guess_type(filename or stored.key)[0]
+        self.media_type = media_type or "application/octet-stream"
+        self.background = background
+        self.init_headers(headers)
+        if filename is not None:
+            content_disposition_filename = quote(filename)
+            if content_disposition_filename != filename:
+                content_disposition = "{}; filename*=utf-8''{}".format(
+                    content_disposition_type, content_disposition_filename
+                )
+            else:
+                content_disposition = '{}; filename="{}"'.format(
+                    content_disposition_type, filename
+                )
+            self.headers.setdefault("content-disposition", content_disposition)
+        etag_base = f"{stored.mtime}-{stored.size}".encode()
+        etag = hashlib.md5(etag_base, usedforsecurity=False).hexdigest()
+        self.headers.setdefault("content-length", str(stored.size))
+        self.headers.setdefault("last-modified", formatdate(stored.mtime, usegmt=True))
+        self.headers.setdefault("etag", f'"{etag}"')
+        self.headers.setdefault("accept-ranges", "bytes")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self._respond(scope, receive, send)
+        finally:
+            if self.stored.fd is not None:
+                await anyio.to_thread.run_sync(os.close, self.stored.fd)
+                self.stored.fd = None
+
+        if self.background is not None:
+            await self.background()
+
+    async def _respond(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request_headers = Headers(scope=scope)
+        file_size = self.stored.size
+        ranges = None
+        if self._if_range_matches(request_headers):
+            ranges = self._parse_range(request_headers.get("range"), file_size)
+
+        if ranges == []:
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{file_size}"
+            self.headers["content-length"] = "0"
+            await self._send_start(send)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        parts: list[tuple[ByteRange, bytes]] = []
+        tail = b""
+        if ranges is None:
+            ranges = [(0, file_size - 1)]
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{file_size}"
+            self.headers["content-length"] = str(end - start + 1)
+        else:
+            self.status_code = 206
+            boundary = token_hex(16)
+            content_type = self.media_type or "application/octet-stream"
+            for start, end in ranges:
+                part_header = (
+                    f"--{boundary}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+                )
+                parts.append(((start, end), part_header.encode("latin-1")))
+            tail = f"--{boundary}--\r\n".encode("latin-1")
+            content_length = len(tail) + sum(
+                len(header) + (end - start + 1) + 2 for (start, end), header in parts
+            )
+            self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+            self.headers["content-length"] = str(content_length)
+
+        await self._send_start(send)
+        if scope["method"].upper() == "HEAD" or file_size == 0:
+            await send({"type": "http.response.body", "body": b""})
+        else:
+            zerocopy = (
+                "http.response.zerocopysend" in scope.get("extensions", {})
+                and self.throttle is None
+            )
+            async with anyio.create_task_group() as task_group:
+
+                async def wrap(func: typing.Callable[[], typing.Awaitable[None]]):
+                    await func()
+                    task_group.cancel_scope.cancel()
+
+                task_group.start_soon(
+                    wrap, lambda: self._send_body(send, ranges, parts, tail, zerocopy)
+                )
+                await wrap(lambda: self._listen_for_disconnect(receive))
+
+    async def _send_start(self, send: Send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+
+    @staticmethod
+    async def _listen_for_disconnect(receive: Receive):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+
+    async def _send_body(
+        self,
+        send: Send,
+        ranges: list[ByteRange],
+        parts: list[tuple[ByteRange, bytes]],
+        tail: bytes,
+        zerocopy: bool,
+    ):
+        fd = self.stored.fd  # Opened by the backend, closed in __call__
+        if fd is None and self.stored.path is not None:
+            fd = await anyio.to_thread.run_sync(os.open, self.stored.path, os.O_RDONLY)
+        try:
+            if not parts:
+                start, end = ranges[0]
+                await self._send_range(send, fd, start, end, False, zerocopy)
+                return
+            for (start, end), header in parts:
+                await send(
+                    {"type": "http.response.body", "body": header, "more_body": True}
+                )
+                await self._send_range(send, fd, start, end, True, zerocopy)
+                await send(
+                    {"type": "http.response.body", "body": b"\r\n", "more_body": True}
+                )
+            await send({"type": "http.response.body", "body": tail})
+        finally:
+            if fd is not None and fd != self.stored.fd:
+                await anyio.to_thread.run_sync(os.close, fd)
+
+    async def _send_range(
+        self,
+        send: Send,
+        fd: int | None,
+        start: int,
+        end: int,
+        more_body: bool,
+        zerocopy: bool,
+    ):
+        if fd is None:
+            async for chunk in self.stored.read(start, end):
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": True}
+                )
+                if self.throttle is not None:
+                    await self.throttle.consume(len(chunk))
+            if not more_body:
+                await send({"type": "http.response.body", "body": b""})
+            return
+        # Reads through stored.read are counted by the storage backend
+        bytes_read = STORAGE_BYTES.labels("read")
+        if zerocopy:
+            await send(
+                {
+                    "type": "http.response.zerocopysend",
+                    "file": fd,
+                    "offset": start,
+                    "count": end - start + 1,
+                    "more_body": more_body,
+                }
+            )
+            bytes_read.inc(end - start + 1)
+            return
+        offset = start
+        while offset <= end:
+            size = min(self.chunk_size, end - offset + 1)
+            chunk = await anyio.to_thread.run_sync(os.pread, fd, size, offset)
+            if not chunk:  # File was truncated
+                break
+            offset += len(chunk)
+            bytes_read.inc(len(chunk))
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": more_body or offset <= end,
+                }
+            )
+            if self.throttle is not None:
+                await self.throttle.consume(len(chunk))
+        if offset <= end and not more_body:
+            await send({"type": "http.response.body", "body": b""})
+
+    def _if_range_matches(self, request_headers: Headers) -> bool:
+        if_range = request_headers.get("if-range")
+        if if_range is None:
+            return True
+        if if_range.startswith("W/"):  # Weak validators never match If-Range
+            return False
+        if if_range.startswith('"'):
+            return if_range == self.headers.get("etag")
+        last_modified = self.headers.get("last-modified")
+        if last_modified is None:
+            return False
+        try:
+            return parsedate_to_datetime(if_range) == parsedate_to_datetime(
+                last_modified
+            )
+        except (TypeError, ValueError):
+            return False
+
+    @classmethod
+    def _parse_range(cls, header: str | None, file_size: int) -> list[ByteRange] | None:
+        """Return None when the whole file must be sent
+        and an empty list when no range is satisfiable"""
+        if header is None:
+            return None
+        unit, _, specs = header.partition("=")
+        if unit.strip().lower() != "bytes" or not specs:
+            return None
+        ranges = []
+        for spec in specs.split(","):
+            first, sep, last = spec.strip().partition("-")
+            if not sep or not (first or last):
+                return None
+            try:
+                if not first:  # Suffix range: last N bytes
+                    length = int(last)
+                    if length == 0 or file_size == 0:
+                        continue
+                    start, end = max(file_size - length, 0), file_size - 1
+                else:
+                    start = int(first)
+                    end = int(last) if last else None
+            except ValueError:
+                return None
+            if start < 0 or (end is not None and end < start):
+                return None
+            if start >= file_size:
+                continue
+            if end is None:
+                end = file_size - 1
+            ranges.append((start, min(end, file_size - 1)))
+        if len(ranges) > cls.max_ranges:
+            return None
+        return ranges
+
+
+class ArchiveResponse(StreamingResponse):
+    """Archive of stored objects, built while it is sent"""
+
+    media_types = {
+        ArchiveFormat.zip: "application/zip",
+        ArchiveFormat.tar: "application/x-tar",
+    }
+
+    def __init__(
+        self,
+        entries: list[ArchiveEntry],
+        archive_format: ArchiveFormat = ArchiveFormat.zip,
+        filename: str = "items",
+        headers: typing.Mapping[str, str] | None = None,
+        throttle: Throttle | None = None,
+    ) -> None:
+        content = stream_archive(entries, archive_format)
+        if throttle is not None:
+            content = throttle.iterate(content)
+        super().__init__(
+            content,
+            headers=headers,
+            media_type=self.media_types[archive_format],
+        )
+        self.headers.setdefault(
+            "content-disposition",
+            f'attachment; filename="{filename}.{archive_format}"',
+        )
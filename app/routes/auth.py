@@ -6,11 +6,13 @@ from app.schemas.auth import (
     AuthUserCreateSchema,
     AuthUserReadSchema,
     AuthUserUpdateSchema,
+    UserUsageSchema,
 )
 from app.services.auth import (
     auth_backend,
     fastapi_users,
 )
+from app.services.usage import UsageService
 from app.dependencies import get_current_user
 
 
@@ -29,3 +31,11 @@ router.include_router(
 @router.get("/me", response_model=AuthUserReadSchema)
 async def get_user_by_token(user: User = Depends(get_current_user)):
     return user
+
+
+@router.get("/me/usage", response_model=UserUsageSchema)
+async def get_user_usage(
+    user: User = Depends(get_current_user),
+    service: UsageService = Depends(),
+):
+    return await service.get_usage(user.id)
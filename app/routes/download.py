@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, Request, Response
+
+from app.services.download import DownloadService
+from app.responses import is_not_modified
+from app.offload import file_response
+
+router = APIRouter(prefix="/api/download", tags=["Download"])
+
+
+async def _token_file_response(
+    token: str, request: Request, service: DownloadService
+) -> Response:
+    schema = service.verify(token)
+    content_encoding = service.get_content_encoding(
+        schema, request.headers.get("accept-encoding")
+    )
+    headers = service.get_cache_headers(schema, content_encoding)
+    if is_not_modified(request.headers, headers):
+        return Response(status_code=304, headers=headers)
+    stored = await service.get_file(schema, content_encoding)
+    if content_encoding is not None:
+        headers["content-encoding"] = content_encoding
+    return file_response(
+        stored,
+        headers=headers,
+        media_type=schema.content_type or "application/octet-stream",
+        filename=schema.filename,
+    )
+
+
+@router.get("/{token}")
+async def download_by_token(
+    token: str, request: Request, service: DownloadService = Depends()
+):
+    """Download by a signed link, no database, cache or auth lookups"""
+    return await _token_file_response(token, request, service)
+
+
+@router.head("/{token}")
+async def head_by_token(
+    token: str, request: Request, service: DownloadService = Depends()
+):
+    return await _token_file_response(token, request, service)
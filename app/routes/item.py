@@ -1,18 +1,32 @@
-from fastapi import APIRouter, Depends
+import datetime as dt
+
+from fastapi import APIRouter, Depends, Query, Request, Response
 from fastapi import UploadFile
-from fastapi.responses import StreamingResponse
 from uuid import UUID
 
+from app.db.tables import Item
+
 from app.schemas.item import ItemShortSchema
 from app.schemas.item import ItemGetSchema
 from app.schemas.item import ItemCreateSchema
+from app.schemas.item import ItemBatchCreateSchema
 from app.schemas.item import ItemUpdateSchema
 from app.schemas.item import ItemFiltersSchema
+from app.schemas.item import ItemSearchSchema
+from app.schemas.item import ArchiveFormat, ItemArchiveSchema
+from app.schemas.item import ItemLinkSchema
 from app.services.item import ItemService
 from app.services.access import ItemAccessService
-from app.dependencies import validate_item
+from app.services.rate_limit import RateLimitService, Throttle
+from app.dependencies import get_unmodified_since, validate_item, validate_items
+from app.responses import ArchiveResponse, is_not_modified
+from app.offload import file_response
 
-router = APIRouter(prefix="/api/item", tags=["Item"])
+router = APIRouter(
+    prefix="/api/item",
+    tags=["Item"],
+    dependencies=[RateLimitService.limit_requests()],
+)
 
 
 @router.get(
@@ -27,20 +41,86 @@ async def get_items(
 
 
 @router.get(
-    "/{item_id}",
-    response_model=ItemGetSchema,
-    dependencies=[ItemAccessService.validate_get_one()],
+    "/search",
+    response_model=list[ItemShortSchema],
+    dependencies=[ItemAccessService.validate_search()],
 )
-async def get_item(item_id: UUID, service: ItemService = Depends()):
-    item = await service.get_one(item_id)
-    stream = service.stream(item_id)
-    return StreamingResponse(
-        stream,
+async def search_items(
+    schema: ItemSearchSchema = Depends(), service: ItemService = Depends()
+):
+    return await service.search(schema)
+
+
+@router.get("/archive", dependencies=[ItemAccessService.validate_get_many()])
+async def get_items_archive(
+    response: Response,
+    filters: ItemArchiveSchema = Depends(),
+    service: ItemService = Depends(),
+    throttle: Throttle | None = RateLimitService.throttle(),
+):
+    """Archive of the items from the page, X-Next-Cursor points to the next one"""
+    entries = await service.get_archive_entries_by_filters(filters)
+    headers = {}
+    if "X-Next-Cursor" in response.headers:
+        headers["X-Next-Cursor"] = response.headers["X-Next-Cursor"]
+    return ArchiveResponse(entries, filters.format, headers=headers, throttle=throttle)
+
+
+@router.post("/archive")
+async def get_items_archive_by_ids(
+    archive_format: ArchiveFormat = Query(ArchiveFormat.zip, alias="format"),
+    items: list[Item] = ItemAccessService.fetch_many(),
+    service: ItemService = Depends(),
+    throttle: Throttle | None = RateLimitService.throttle(),
+):
+    entries = await service.get_archive_entries(items)
+    return ArchiveResponse(entries, archive_format, throttle=throttle)
+
+
+async def _item_file_response(
+    item: Item,
+    request: Request,
+    service: ItemService,
+    throttle: Throttle | None = None,
+) -> Response:
+    content_encoding = service.get_content_encoding(
+        item, request.headers.get("accept-encoding")
+    )
+    headers = service.get_cache_headers(item, content_encoding)
+    if is_not_modified(request.headers, headers):
+        return Response(status_code=304, headers=headers)
+    stored = await service.get_file(item, content_encoding)
+    if content_encoding is not None:
+        headers["content-encoding"] = content_encoding
+    return file_response(
+        stored,
+        headers=headers,
         media_type="application/octet-stream",
-        headers={"Content-Disposition": f'attachment; filename="{item.filename}"'},
+        filename=item.filename,
+        throttle=throttle,
     )
 
 
+@router.get("/{item_id}", response_model=ItemGetSchema)
+async def get_item(
+    request: Request,
+    item: Item = ItemAccessService.fetch_get_one(),
+    service: ItemService = Depends(),
+    throttle: Throttle | None = RateLimitService.throttle(),
+):
+    return await _item_file_response(item, request, service, throttle)
+
+
+@router.head("/{item_id}")
+async def head_item(
+    request: Request,
+    item: Item = ItemAccessService.fetch_get_one(),
+    service: ItemService = Depends(),
+):
+    """Headers of the download, the content isn't read"""
+    return await _item_file_response(item, request, service)
+
+
 @router.post(
     "",
     response_model=ItemShortSchema,
@@ -55,15 +135,68 @@ async def create_item(
     return await service.create(schema, item_raw)
 
 
+@router.post(
+    "/batch",
+    response_model=list[ItemShortSchema],
+    status_code=201,
+    dependencies=[ItemAccessService.validate_create()],
+)
+async def create_items(
+    schema: ItemBatchCreateSchema = Depends(),
+    items_raw: list[UploadFile] = Depends(validate_items),
+    service: ItemService = Depends(),
+):
+    return await service.create_many(schema, items_raw)
+
+
+@router.post("/batch/get", response_model=list[ItemGetSchema])
+async def get_items_by_ids(items: list[Item] = ItemAccessService.fetch_many()):
+    return items
+
+
+@router.post("/batch/delete", status_code=204)
+async def delete_items(
+    items: list[Item] = ItemAccessService.fetch_many(),
+    service: ItemService = Depends(),
+):
+    return await service.delete_many(items)
+
+
+@router.post("/{item_id}/link", response_model=ItemLinkSchema)
+async def create_item_link(
+    request: Request,
+    ttl: int | None = Query(None, gt=0, description="Seconds"),
+    item: Item = ItemAccessService.fetch_get_one(),
+    service: ItemService = Depends(),
+):
+    """Signed URL downloading the item without authorization until it expires"""
+    token, expires_at = await service.create_link(item, ttl)
+    url = request.url_for("download_by_token", token=token)
+    return ItemLinkSchema(url=str(url), expires_at=expires_at)
+
+
+@router.post(
+    "/{item_id}/copy",
+    response_model=ItemShortSchema,
+    status_code=201,
+    dependencies=[ItemAccessService.validate_copy()],
+)
+async def copy_item(item_id: UUID, service: ItemService = Depends()):
+    return await service.copy(item_id)
+
+
 @router.patch(
     "/{item_id}",
     response_model=ItemShortSchema,
     dependencies=[ItemAccessService.validate_update()],
 )
 async def update_item(
-    item_id: UUID, schema: ItemUpdateSchema, service: ItemService = Depends()
+    item_id: UUID,
+    schema: ItemUpdateSchema,
+    unmodified_since: dt.datetime | None = Depends(get_unmodified_since),
+    service: ItemService = Depends(),
 ):
-    return await service.update(item_id, schema)
+    return await service.update(item_id, schema, unmodified_since)
 
 
 @router.delete(
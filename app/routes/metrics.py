@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Response
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from app.metrics import collect
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Multiprocess collection reads the files of all workers
+    return Response(await run_in_threadpool(collect), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, Request
+from uuid import UUID
+
+from app.schemas.item import ItemShortSchema
+from app.schemas.upload import UploadSessionCreateSchema, UploadSessionSchema
+from app.schemas.upload import UploadChunkSchema
+from app.services.upload import UploadService
+from app.services.access import UploadAccessService
+from app.services.rate_limit import RateLimitService, Throttle
+
+router = APIRouter(
+    prefix="/api/upload",
+    tags=["Upload"],
+    dependencies=[RateLimitService.limit_requests()],
+)
+
+
+@router.post(
+    "",
+    response_model=UploadSessionSchema,
+    status_code=201,
+    dependencies=[UploadAccessService.validate_create()],
+)
+async def create_upload_session(
+    schema: UploadSessionCreateSchema, service: UploadService = Depends()
+):
+    return await service.create(schema)
+
+
+@router.get(
+    "/{session_id}",
+    response_model=UploadSessionSchema,
+    dependencies=[UploadAccessService.validate_get_one()],
+)
+async def get_upload_session(session_id: UUID, service: UploadService = Depends()):
+    return await service.get_one(session_id)
+
+
+@router.put(
+    "/{session_id}",
+    response_model=UploadChunkSchema,
+    dependencies=[UploadAccessService.validate_write()],
+)
+async def write_upload_chunk(
+    session_id: UUID,
+    offset: int,
+    request: Request,
+    service: UploadService = Depends(),
+    throttle: Throttle | None = RateLimitService.throttle(),
+):
+    stream = request.stream()
+    if throttle is not None:
+        stream = throttle.iterate(stream)
+    return await service.write_chunk(session_id, offset, stream)
+
+
+@router.post(
+    "/{session_id}/complete",
+    response_model=ItemShortSchema,
+    status_code=201,
+    dependencies=[UploadAccessService.validate_complete()],
+)
+async def complete_upload_session(session_id: UUID, service: UploadService = Depends()):
+    return await service.complete(session_id)
+
+
+@router.delete(
+    "/{session_id}",
+    status_code=204,
+    dependencies=[UploadAccessService.validate_delete()],
+)
+async def delete_upload_session(session_id: UUID, service: UploadService = Depends()):
+    await service.delete(session_id)
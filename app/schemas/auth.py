@@ -1,3 +1,4 @@
+from pydantic import BaseModel
 from fastapi_users import schemas
 
 
@@ -11,3 +12,9 @@ class AuthUserCreateSchema(schemas.BaseUserCreate):
 
 class AuthUserUpdateSchema(schemas.BaseUserUpdate):
     name: str | None = None
+
+
+class UserUsageSchema(BaseModel):
+    used_bytes: int
+    item_count: int
+    quota_bytes: int | None = None  # No quota if null
@@ -4,3 +4,4 @@ from pydantic import BaseModel
 class BaseFiltersSchema(BaseModel):
     page: int = 0
     count: int = 100
+    cursor: str | None = None  # From X-Next-Cursor header, replaces page
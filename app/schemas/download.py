@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class DownloadTokenSchema(BaseModel):
+    """Everything a signed download needs, so it's served without lookups"""
+
+    blob_id: str
+    codec: str | None = None
+    size: int | None = None  # Original size, for decompression
+    filename: str
+    content_type: str | None = None
+    expires: int  # Unix time
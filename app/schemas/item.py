@@ -1,7 +1,11 @@
-from pydantic import BaseModel, ConfigDict
+import datetime as dt
+from enum import StrEnum
+from pydantic import BaseModel, ConfigDict, Field
 from uuid import UUID
 
 from .base import BaseFiltersSchema
+from app.db.tables import ProcessingStatus
+from app.repositories.storage import settings as storage_settings
 
 
 class ItemGetSchema(BaseModel):
@@ -9,6 +13,10 @@ class ItemGetSchema(BaseModel):
     owner_id: int
     name: str
     filename: str
+    blob_id: str
+    size_bytes: int | None = None
+    content_type: str | None = None
+    processing_status: ProcessingStatus | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -18,11 +26,25 @@ class ItemCreateSchema(BaseModel):
     owner_id: int
 
 
+class ItemBatchCreateSchema(BaseModel):
+    """Items are named after the uploaded files"""
+
+    owner_id: int
+
+
+class ItemIdsSchema(BaseModel):
+    ids: list[UUID] = Field(
+        min_length=1, max_length=storage_settings.upload_batch_max_files
+    )
+
+
 class ItemShortSchema(BaseModel):
     id: UUID
     owner_id: int
     name: str
     filename: str
+    size_bytes: int | None = None
+    processing_status: ProcessingStatus | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -34,3 +56,30 @@ class ItemFiltersSchema(BaseFiltersSchema):
 
 class ItemUpdateSchema(BaseModel):
     name: str | None = None
+
+
+class ItemSearchMode(StrEnum):
+    prefix = "prefix"
+    substring = "substring"
+    fuzzy = "fuzzy"
+
+
+class ItemSearchSchema(BaseModel):
+    q: str = Field(min_length=1)
+    mode: ItemSearchMode = ItemSearchMode.substring
+    page: int = 0
+    count: int = 100
+
+
+class ArchiveFormat(StrEnum):
+    zip = "zip"
+    tar = "tar"
+
+
+class ItemArchiveSchema(ItemFiltersSchema):
+    format: ArchiveFormat = ArchiveFormat.zip
+
+
+class ItemLinkSchema(BaseModel):
+    url: str
+    expires_at: dt.datetime
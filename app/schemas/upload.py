@@ -0,0 +1,26 @@
+import datetime as dt
+from pydantic import BaseModel, ConfigDict, Field
+from uuid import UUID
+
+
+class UploadSessionCreateSchema(BaseModel):
+    name: str
+    filename: str
+    size: int = Field(ge=0)
+
+
+class UploadSessionSchema(BaseModel):
+    id: UUID
+    owner_id: int
+    name: str
+    filename: str
+    size: int
+    expires_at: dt.datetime
+    received: list[tuple[int, int]] = []  # Merged [start, end) ranges
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class UploadChunkSchema(BaseModel):
+    offset: int
+    size: int
@@ -1 +1,2 @@
 from .item import ItemAccessService
+from .upload import UploadAccessService
@@ -1,4 +1,5 @@
-from fastapi import Depends
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import ColumnElement
 from uuid import UUID
 
 from app.db.tables import User, Item
@@ -7,7 +8,7 @@ from app.dependencies import get_current_user
 from app.exceptions import AuthException
 from app.repositories.item import ItemRepository
 
-from app.schemas.item import ItemFiltersSchema
+from app.schemas.item import ItemFiltersSchema, ItemIdsSchema
 
 
 class ItemAccessService:
@@ -19,13 +20,11 @@ class ItemAccessService:
         self.item_repository = item_repository
         self.current_user = current_user
 
-    async def filter_get_many_response(self, items: list[Item]) -> list[Item]:
+    def filter_get_many_query(self) -> list[ColumnElement[bool]]:
+        """Predicates limiting listed items to the visible ones"""
         if self.current_user.is_superuser:
-            return items
-        for i in range(len(items)):
-            if items[i].owner_id != self.current_user.id:
-                items[i] = None
-        return list(filter(lambda i: i is not None, items))
+            return []
+        return [Item.owner_id == self.current_user.id]
 
     @classmethod
     def validate_get_many(cls):
@@ -38,6 +37,13 @@ class ItemAccessService:
 
         return Depends(validator)
 
+    @classmethod
+    def validate_search(cls):
+        async def validator(self: ItemAccessService = Depends(cls)):
+            pass
+
+        return Depends(validator)
+
     @classmethod
     def _get_base_validator(cls):
         async def validator(item_id: UUID, self: ItemAccessService = Depends(cls)):
@@ -67,3 +73,51 @@ class ItemAccessService:
     @classmethod
     def validate_get_one(cls):
         return cls._get_base_validator()
+
+    @classmethod
+    def fetch_get_one(cls):
+        """Validate access and return the item with a single lookup,
+        the owner is checked on the fetched row"""
+
+        async def fetcher(
+            item_id: UUID, self: ItemAccessService = Depends(cls)
+        ) -> Item:
+            item = await self.item_repository.get_one(
+                item_id=item_id, mute_not_found_exception=True
+            )
+            if self.current_user.is_superuser:
+                if item is None:
+                    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+                return item
+            if item is None or item.owner_id != self.current_user.id:
+                raise AuthException()
+            return item
+
+        return Depends(fetcher)
+
+    @classmethod
+    def fetch_many(cls):
+        """Access check for a list of items with a single query.
+        The whole request is rejected if any item isn't available"""
+
+        async def fetcher(
+            schema: ItemIdsSchema, self: ItemAccessService = Depends(cls)
+        ) -> list[Item]:
+            items = await self.item_repository.get_many_by_ids(schema.ids)
+            found = {item.id for item in items}
+            missing = any(item_id not in found for item_id in schema.ids)
+            if self.current_user.is_superuser:
+                if missing:
+                    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+            elif missing or any(
+                item.owner_id != self.current_user.id for item in items
+            ):
+                raise AuthException()
+            order = {item_id: i for i, item_id in enumerate(schema.ids)}
+            return sorted(items, key=lambda item: order[item.id])
+
+        return Depends(fetcher)
+
+    @classmethod
+    def validate_copy(cls):
+        return cls._get_base_validator()
@@ -0,0 +1,52 @@
+from fastapi import Depends
+from uuid import UUID
+
+from app.db.tables import User
+
+from app.dependencies import get_current_user
+from app.exceptions import AuthException
+from app.repositories.upload import UploadSessionRepository
+
+
+class UploadAccessService:
+    def __init__(
+        self,
+        upload_repository: UploadSessionRepository = Depends(),
+        current_user: User = Depends(get_current_user),
+    ):
+        self.upload_repository = upload_repository
+        self.current_user = current_user
+
+    @classmethod
+    def _get_base_validator(cls):
+        async def validator(session_id: UUID, self: UploadAccessService = Depends(cls)):
+            if self.current_user.is_superuser:
+                return
+            owner_id = await self.upload_repository.get_owner_id(session_id)
+            if owner_id != self.current_user.id:
+                raise AuthException()
+
+        return Depends(validator)
+
+    @classmethod
+    def validate_create(cls):
+        async def validator(self: UploadAccessService = Depends(cls)):
+            pass
+
+        return Depends(validator)
+
+    @classmethod
+    def validate_get_one(cls):
+        return cls._get_base_validator()
+
+    @classmethod
+    def validate_write(cls):
+        return cls._get_base_validator()
+
+    @classmethod
+    def validate_complete(cls):
+        return cls._get_base_validator()
+
+    @classmethod
+    def validate_delete(cls):
+        return cls._get_base_validator()
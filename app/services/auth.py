@@ -1,28 +1,164 @@
+from collections import OrderedDict
 from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any
 import os
+import time
 
-from fastapi import Depends
+import jwt
+from fastapi import Depends, Request
 from fastapi_users import BaseUserManager, IntegerIDMixin
 from fastapi_users import FastAPIUsers
+from fastapi_users import exceptions
 from fastapi_users.authentication import (
     AuthenticationBackend,
     BearerTransport,
     JWTStrategy,
 )
 from fastapi_users.db import SQLAlchemyUserDatabase
+from fastapi_users.jwt import decode_jwt
+from pydantic_settings import BaseSettings
 
 from app.db.tables import User
 from app.db.base import get_session
+from app.repositories.cache import RedisCache, Row, dump_row, load_row
 
 SECRET = os.getenv("AUTH_SECRET")
+if not SECRET:
+    # Signs tokens and download links, fail on start rather than per request
+    raise RuntimeError("AUTH_SECRET is not set")
 
 bearer_transport = BearerTransport(tokenUrl="/api/auth/login")
 
 
+class Settings(BaseSettings):
+    user_cache_size: int = 10000
+    user_cache_local_ttl: int = 10  # Seconds, bounds staleness in other workers
+    user_cache_ttl: int = 60  # Seconds, in Redis
+    user_cache_redis: bool = True
+
+
+settings = Settings()
+
+
+class UserCache:
+    """Authenticated users by token. Tokens are mapped to user ids until they
+    expire, users are kept in a per-process LRU and shared through Redis.
+    Password hashes are never cached"""
+
+    def __init__(
+        self,
+        size: int = settings.user_cache_size,
+        local_ttl: int = settings.user_cache_local_ttl,
+    ):
+        self.size = size
+        self.local_ttl = local_ttl
+        self._tokens: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._users: OrderedDict[int, tuple[User, float]] = OrderedDict()
+        self.redis_cache = None
+        if settings.user_cache_redis:
+            self.redis_cache = RedisCache("user", ttl=settings.user_cache_ttl)
+
+    def _get_local[K, V](
+        self, lru: OrderedDict[K, tuple[V, float]], key: K
+    ) -> V | None:
+        entry = lru.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.time():
+            del lru[key]
+            return None
+        lru.move_to_end(key)
+        return entry[0]
+
+    def _put_local[K, V](
+        self, lru: OrderedDict[K, tuple[V, float]], key: K, value: V, expires: float
+    ):
+        lru[key] = (value, expires)
+        lru.move_to_end(key)
+        while len(lru) > self.size:
+            lru.popitem(last=False)
+
+    def _read_user_id(
+        self, token: str, strategy: JWTStrategy, user_manager: "UserManager"
+    ) -> int | None:
+        user_id = self._get_local(self._tokens, token)
+        if user_id is not None:
+            return user_id
+        try:
+            data = decode_jwt(
+                token,
+                strategy.decode_key,
+                strategy.token_audience,
+                algorithms=[strategy.algorithm],
+            )
+            user_id = user_manager.parse_id(data["sub"])
+        except (jwt.PyJWTError, KeyError, exceptions.InvalidID):
+            return None
+        self._put_local(self._tokens, token, user_id, data.get("exp", float("inf")))
+        return user_id
+
+    @staticmethod
+    async def _load_row(user_id: int, user_manager: "UserManager") -> Row | None:
+        try:
+            user = await user_manager.get(user_id)
+        except exceptions.UserNotExists:
+            return None
+        row = dump_row(user)
+        row.pop("hashed_password")
+        return row
+
+    async def get_user(
+        self, token: str | None, strategy: JWTStrategy, user_manager: "UserManager"
+    ) -> User | None:
+        if token is None:
+            return None
+        user_id = self._read_user_id(token, strategy, user_manager)
+        if user_id is None:
+            return None
+        user = self._get_local(self._users, user_id)
+        if user is not None:
+            return user
+        if self.redis_cache is None:
+            row = await self._load_row(user_id, user_manager)
+        else:
+            row = await self.redis_cache.get_or_load(
+                str(user_id), lambda: self._load_row(user_id, user_manager)
+            )
+        if row is None:
+            return None
+        user = load_row(User, row)
+        self._put_local(self._users, user_id, user, time.time() + self.local_ttl)
+        return user
+
+    async def invalidate(self, user_id: int):
+        self._users.pop(user_id, None)
+        if self.redis_cache is not None:
+            await self.redis_cache.delete(str(user_id))
+
+
+user_cache = UserCache()
+
+
 class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
     reset_password_token_secret = SECRET
     verification_token_secret = SECRET
 
+    async def on_after_update(
+        self, user: User, update_dict: dict[str, Any], request: Request | None = None
+    ) -> None:
+        await user_cache.invalidate(user.id)
+
+    async def on_after_reset_password(
+        self, user: User, request: Request | None = None
+    ) -> None:
+        await user_cache.invalidate(user.id)
+
+    async def on_after_verify(self, user: User, request: Request | None = None) -> None:
+        await user_cache.invalidate(user.id)
+
+    async def on_after_delete(self, user: User, request: Request | None = None) -> None:
+        await user_cache.invalidate(user.id)
+
 
 class _AuthUserModel(SQLAlchemyUserDatabase):
     pass
@@ -0,0 +1,141 @@
+from collections import Counter
+
+from fastapi import Depends
+from loguru import logger
+
+from app.repositories.blob import BlobRepository
+from app.repositories.storage import Codec, StorageRepository, StoredObject
+from app.repositories.storage import decompressed
+
+
+class BlobService:
+    """Stored content of items. The file is stored with the first reference
+    to the blob and removed after the last one is committed. Callers finish
+    the transaction with commit, or discard when it fails"""
+
+    def __init__(
+        self,
+        repository: BlobRepository = Depends(),
+        storage_repository: StorageRepository = Depends(),
+    ):
+        self.repository = repository
+        self.storage_repository = storage_repository
+        self._stored: list[str] = []  # New blobs of the transaction
+        self._released: list[str] = []  # Blobs left without references
+
+    async def store(
+        self, staging_name: str, digest: str, size: int, filename: str | None
+    ) -> Codec | None:
+        """Reference the content of the staging file, the file is kept.
+        Return codec of the stored content"""
+        codec = self.storage_repository.choose_codec(filename, size)
+        blob = await self.repository.acquire(digest, size, codec)
+        if blob.ref_count > 1:  # Same content is already stored
+            return blob.codec
+        stored_codec = await self.storage_repository.commit_staging(
+            staging_name, digest, blob.codec
+        )
+        self._stored.append(digest)
+        if stored_codec != blob.codec:
+            await self.repository.set_codec(digest, stored_codec)
+        return stored_codec
+
+    async def store_many(
+        self, staged: list[tuple[str, str, int, str | None]]
+    ) -> list[Codec | None]:
+        """store for (staging name, digest, size, filename) of many files,
+        with one statement for all blob rows"""
+        blobs: dict[str, tuple[int, int, Codec | None]] = {}
+        for _, digest, size, filename in staged:
+            if digest in blobs:
+                size, references, codec = blobs[digest]
+                blobs[digest] = (size, references + 1, codec)
+            else:
+                codec = self.storage_repository.choose_codec(filename, size)
+                blobs[digest] = (size, 1, codec)
+        codecs: dict[str, Codec | None] = {}
+        acquired = await self.repository.acquire_many(blobs)
+        for staging_name, digest, _, _ in staged:
+            blob = acquired[digest]
+            is_new = blob.ref_count == blobs[digest][1]
+            if digest in codecs or not is_new:
+                codecs.setdefault(digest, blob.codec)
+                continue
+            codecs[digest] = await self.storage_repository.commit_staging(
+                staging_name, digest, blob.codec
+            )
+            self._stored.append(digest)
+            if codecs[digest] != blob.codec:
+                await self.repository.set_codec(digest, codecs[digest])
+        return [codecs[digest] for _, digest, _, _ in staged]
+
+    async def add_reference(self, blob_id: str) -> bool:
+        return await self.repository.add_reference(blob_id)
+
+    async def release(self, blob_id: str) -> None:
+        if await self.repository.release(blob_id):
+            self._released.append(blob_id)
+
+    async def release_many(self, blob_ids: list[str]) -> None:
+        self._released += await self.repository.release_many(Counter(blob_ids))
+
+    async def commit(self) -> None:
+        """Commit the transaction, then remove the content of released blobs.
+        Content stored for a failed commit is left behind: the rows aren't
+        locked anymore, so the same content may be stored by another upload"""
+        self._stored.clear()
+        await self.repository.commit()
+        released, self._released = self._released, []
+        if not released:
+            return
+        try:
+            await self.purge(released)
+        except Exception as e:
+            logger.warning(f"Blobs are left for the sweep: {e}")
+
+    async def discard(self) -> None:
+        """Remove content stored in the failed transaction. Called before
+        the rollback, while the rows of the new blobs are still locked"""
+        stored, self._stored = self._stored, []
+        self._released.clear()
+        for blob_id in stored:
+            await self.storage_repository.delete(blob_id)
+
+    async def purge(self, blob_ids: list[str] | None = None) -> int:
+        """Delete blobs without references and their content, in a
+        transaction of its own. Files are removed while the rows are locked,
+        an upload of the same content waits and stores it again.
+        Without ids any unreferenced blobs are purged, e.g. by the worker.
+        Return count of the purged blobs"""
+        purged = await self.repository.purge(blob_ids)
+        for blob_id in purged:
+            await self.storage_repository.delete(blob_id)
+        await self.repository.commit()
+        return len(purged)
+
+    async def open(
+        self, blob_id: str, codec: Codec | None, size: int | None = None
+    ) -> StoredObject | None:
+        """Original content of the blob, decompressed on the fly.
+        Size of the original content is loaded when it isn't given"""
+        if codec is None:
+            return await self.storage_repository.open(blob_id)
+        return await self.stat(blob_id, codec, size)
+
+    async def stat(
+        self, blob_id: str, codec: Codec | None, size: int | None = None
+    ) -> StoredObject | None:
+        """Like open, but the file isn't held open, for readers of the content"""
+        stored = await self.storage_repository.stat(blob_id)
+        if stored is None or codec is None:
+            return stored
+        if size is None:
+            size = (await self.repository.get_sizes([blob_id])).get(blob_id)
+        return decompressed(stored, Codec(codec), size)
+
+    async def open_encoded(self, blob_id: str) -> StoredObject | None:
+        """Stored content as is, compressed ones are sent with Content-Encoding"""
+        return await self.storage_repository.open(blob_id)
+
+    async def get_sizes(self, blob_ids: list[str]) -> dict[str, int | None]:
+        return await self.repository.get_sizes(blob_ids)
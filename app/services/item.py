@@ -1,13 +1,27 @@
+from email.utils import formatdate
+from functools import partial
+import datetime as dt
+
 from fastapi import Depends, UploadFile
+from fastapi import HTTPException, status
 from uuid import UUID, uuid4
 
 from app.schemas.item import ItemGetSchema, ItemCreateSchema
+from app.schemas.item import ItemBatchCreateSchema
 from app.schemas.item import ItemShortSchema, ItemFiltersSchema
-from app.schemas.item import ItemUpdateSchema
+from app.schemas.item import ItemUpdateSchema, ItemSearchSchema
+from app.schemas.download import DownloadTokenSchema
 from app.repositories.item import ItemRepository
-from app.repositories.storage import StorageRepository
+from app.repositories.storage import StorageRepository, StoredObject
+from app.repositories.storage import settings as storage_settings
 from app.services.access import ItemAccessService
-from app.db.tables import Item
+from app.services.blob import BlobService
+from app.services.download import DownloadService
+from app.services.job import JobService
+from app.services.usage import UsageService
+from app.archive import ArchiveEntry
+from app.responses import accepts_encoding
+from app.db.tables import Item, ProcessingStatus
 
 
 class ItemService:
@@ -16,38 +30,269 @@ class ItemService:
         repository: ItemRepository = Depends(),
         access_service: ItemAccessService = Depends(),
         storage_repository: StorageRepository = Depends(),
+        blob_service: BlobService = Depends(),
+        job_service: JobService = Depends(),
+        usage_service: UsageService = Depends(),
     ):
         self.repository = repository
         self.access_service = access_service
         self.storage_repository = storage_repository
+        self.blob_service = blob_service
+        self.job_service = job_service
+        self.usage_service = usage_service
 
     async def create(
         self, schema: ItemCreateSchema, file: UploadFile
     ) -> ItemShortSchema:
-        system_filename = uuid4()
-        self.storage_repository.create(file.file, str(system_filename))
-        model = Item(id=system_filename, filename=file.filename, **schema.model_dump())
-        model = await self.repository.create(model)
+        remaining = await self.usage_service.get_remaining(schema.owner_id)
+        # Don't hold the connection while the content is stored,
+        # the quota is enforced by charge
+        await self.repository.commit()
+        staging_name, digest, size = await self.storage_repository.ingest(
+            file.file, remaining
+        )
+        try:
+            codec = await self.blob_service.store(
+                staging_name, digest, size, file.filename
+            )
+            await self.usage_service.charge(schema.owner_id, size)
+            model = Item(
+                id=uuid4(),
+                filename=file.filename,
+                blob_id=digest,
+                size_bytes=size,
+                content_type=self.storage_repository.guess_content_type(
+                    file.filename, file.content_type
+                ),
+                codec=codec,
+                **schema.model_dump(),
+            )
+            model = await self.repository.create(model, do_commit=False)
+            await self.blob_service.commit()
+        except BaseException:
+            await self.blob_service.discard()
+            raise
+        finally:
+            await self.storage_repository.delete_staging(staging_name)
+        await self.job_service.process_items(model.id)
+        return ItemShortSchema.model_validate(model)
+
+    async def create_many(
+        self, schema: ItemBatchCreateSchema, files: list[UploadFile]
+    ) -> list[ItemShortSchema]:
+        """All items are created in one transaction"""
+        remaining = await self.usage_service.get_remaining(schema.owner_id)
+        # Don't hold the connection while the content is stored,
+        # the quota is enforced by charge
+        await self.repository.commit()
+        staged: list[tuple[str, str, int, str | None]] = []
+        try:
+            for file in files:
+                staging_name, digest, size = await self.storage_repository.ingest(
+                    file.file, remaining
+                )
+                staged.append((staging_name, digest, size, file.filename))
+                if remaining is not None:
+                    remaining -= size
+            codecs = await self.blob_service.store_many(staged)
+            await self.usage_service.charge(
+                schema.owner_id, sum(size for _, _, size, _ in staged), len(staged)
+            )
+            rows = [
+                {
+                    "id": uuid4(),
+                    "name": file.filename,
+                    "filename": file.filename,
+                    "owner_id": schema.owner_id,
+                    "blob_id": digest,
+                    "size_bytes": size,
+                    "content_type": self.storage_repository.guess_content_type(
+                        file.filename, file.content_type
+                    ),
+                    "codec": codec,
+                }
+                for file, (_, digest, size, _), codec in zip(files, staged, codecs)
+            ]
+            models = await self.repository.create_many(rows, do_commit=False)
+            await self.blob_service.commit()
+        except BaseException:
+            await self.blob_service.discard()
+            raise
+        finally:
+            for staging_name, _, _, _ in staged:
+                await self.storage_repository.delete_staging(staging_name)
+        await self.job_service.process_items(*(model.id for model in models))
+        return [ItemShortSchema.model_validate(model) for model in models]
+
+    async def copy(self, item_id: UUID) -> ItemShortSchema:
+        """Metadata-only copy, the new item shares the stored content"""
+        source = await self.repository.get_one(item_id)
+        owner_id = self.access_service.current_user.id
+        if not await self.blob_service.add_reference(source.blob_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        await self.usage_service.charge(owner_id, source.size_bytes or 0)
+        model = Item(
+            id=uuid4(),
+            name=source.name,
+            filename=source.filename,
+            owner_id=owner_id,
+            blob_id=source.blob_id,
+            size_bytes=source.size_bytes,
+            content_type=source.content_type,
+            codec=source.codec,
+            processing_status=source.processing_status,
+        )
+        is_processed = model.processing_status in (
+            None,
+            ProcessingStatus.done,
+            ProcessingStatus.failed,
+        )
+        if not is_processed:
+            model.processing_status = ProcessingStatus.pending
+        model = await self.repository.create(model, do_commit=False)
+        await self.repository.commit()
+        if not is_processed:
+            await self.job_service.process_items(model.id)
         return ItemShortSchema.model_validate(model)
 
     async def get_one(self, item_id: UUID):
         item = await self.repository.get_one(item_id)
         return ItemGetSchema.model_validate(item)
 
-    def stream(self, item_filename: UUID):
-        return self.storage_repository.get(str(item_filename))
+    @staticmethod
+    def get_content_encoding(item: Item, accept_encoding: str | None) -> str | None:
+        """Compressed content is sent as is when the client accepts the coding,
+        otherwise it's decompressed"""
+        if item.codec is not None and accepts_encoding(accept_encoding, item.codec):
+            return item.codec
+        return None
+
+    @staticmethod
+    def get_cache_headers(item: Item, content_encoding: str | None) -> dict[str, str]:
+        """Content of an item never changes, so its digest is a strong ETag
+        and the creation time is the modification time"""
+        etag = item.blob_id
+        if content_encoding is not None:
+            etag += f"-{content_encoding}"
+        last_modified = item.created_at.replace(tzinfo=dt.UTC).timestamp()
+        headers = {
+            "etag": f'"{etag}"',
+            "last-modified": formatdate(last_modified, usegmt=True),
+            "cache-control": storage_settings.download_cache_control,
+        }
+        if item.codec is not None:
+            headers["vary"] = "Accept-Encoding"
+        return headers
+
+    async def get_file(
+        self, item: Item, content_encoding: str | None = None
+    ) -> StoredObject:
+        """The file is opened here, so a missing file is 404 before
+        the response starts. Files the proxy sends are only looked up"""
+        if storage_settings.download_offload is not None and (
+            content_encoding is not None or item.codec is None
+        ):
+            stored = await self.blob_service.stat(item.blob_id, None)
+        elif content_encoding is not None:
+            stored = await self.blob_service.open_encoded(item.blob_id)
+        else:
+            stored = await self.blob_service.open(
+                item.blob_id, item.codec, item.size_bytes
+            )
+        if stored is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        return stored
+
+    async def create_link(
+        self, item: Item, ttl: int | None = None
+    ) -> tuple[str, dt.datetime]:
+        """Signed download token of the item and its expiry time"""
+        if ttl is None:
+            ttl = storage_settings.download_link_ttl
+        ttl = min(ttl, storage_settings.download_link_max_ttl)
+        size = item.size_bytes
+        if size is None and item.codec is not None:
+            size = (await self.blob_service.get_sizes([item.blob_id])).get(item.blob_id)
+        expires_at = dt.datetime.now(dt.UTC).replace(microsecond=0) + dt.timedelta(
+            seconds=ttl
+        )
+        schema = DownloadTokenSchema(
+            blob_id=item.blob_id,
+            codec=item.codec,
+            size=size,
+            filename=item.filename,
+            content_type=item.content_type,
+            expires=int(expires_at.timestamp()),
+        )
+        return DownloadService.sign(schema), expires_at
 
     async def get_many(self, filters: ItemFiltersSchema) -> list[ItemShortSchema]:
         filters = filters.model_dump(exclude_none=True)
-        models = await self.repository.get_many(**filters)
-        models = await self.access_service.filter_get_many_response(models)
+        where = self.access_service.filter_get_many_query()
+        models = await self.repository.get_many(where=where, **filters)
         return [ItemShortSchema.model_validate(model) for model in models]
 
-    async def update(self, item_id: UUID, schema: ItemUpdateSchema) -> ItemShortSchema:
+    async def get_archive_entries(self, items: list[Item]) -> list[ArchiveEntry]:
+        """Files are opened one by one while the archive is sent"""
+        compressed = [
+            item.blob_id
+            for item in items
+            if item.codec is not None and item.size_bytes is None
+        ]
+        sizes = await self.blob_service.get_sizes(compressed) if compressed else {}
+        return [
+            ArchiveEntry(
+                item.filename,
+                item.created_at,
+                partial(
+                    self.blob_service.stat,
+                    item.blob_id,
+                    item.codec,
+                    item.size_bytes or sizes.get(item.blob_id),
+                ),
+            )
+            for item in items
+        ]
+
+    async def get_archive_entries_by_filters(
+        self, filters: ItemFiltersSchema
+    ) -> list[ArchiveEntry]:
+        filters = filters.model_dump(exclude_none=True, exclude={"format"})
+        where = self.access_service.filter_get_many_query()
+        models = await self.repository.get_many(where=where, **filters)
+        return await self.get_archive_entries(models)
+
+    async def search(self, schema: ItemSearchSchema) -> list[ItemShortSchema]:
+        where = self.access_service.filter_get_many_query()
+        models = await self.repository.search(
+            schema.q, schema.mode, schema.page, schema.count, where=where
+        )
+        return [ItemShortSchema.model_validate(model) for model in models]
+
+    async def update(
+        self,
+        item_id: UUID,
+        schema: ItemUpdateSchema,
+        unmodified_since: dt.datetime | None = None,
+    ) -> ItemShortSchema:
         fields = schema.model_dump(exclude_none=True)
-        model = await self.repository.update(item_id, **fields)
+        model = await self.repository.update(
+            item_id, unmodified_since=unmodified_since, **fields
+        )
         return ItemShortSchema.model_validate(model)
 
     async def delete(self, item_id: UUID) -> None:
-        self.storage_repository.delete(str(item_id))
-        await self.repository.delete(item_id)
+        model = await self.repository.delete(item_id, do_commit=False)
+        await self.blob_service.release(model.blob_id)
+        await self.usage_service.refund([model])
+        await self.repository.commit()  # Also drops the item from the cache
+        await self.blob_service.commit()
+
+    async def delete_many(self, items: list[Item]) -> None:
+        models = await self.repository.delete_many(
+            [item.id for item in items], do_commit=False
+        )
+        await self.blob_service.release_many([model.blob_id for model in models])
+        await self.usage_service.refund(models)
+        await self.repository.commit()
+        await self.blob_service.commit()
@@ -0,0 +1,53 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+from uuid import UUID
+
+from fastapi import Depends
+from loguru import logger
+from redis.exceptions import RedisError
+
+from app.repositories.job import JobRepository
+
+type JobFunc = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+@dataclass
+class JobHandler:
+    func: JobFunc
+    on_failure: JobFunc | None = None  # Called when the last attempt failed
+
+
+handlers: dict[str, JobHandler] = {}
+
+
+def job_handler(name: str, on_failure: JobFunc | None = None):
+    """Register the function as handler of the jobs with name.
+    Jobs are delivered at least once, so handlers must be idempotent"""
+
+    def decorator(func: JobFunc) -> JobFunc:
+        handlers[name] = JobHandler(func, on_failure)
+        return func
+
+    return decorator
+
+
+class JobService:
+    def __init__(self, repository: JobRepository = Depends()):
+        self.repository = repository
+
+    async def enqueue(self, name: str, *payloads: dict[str, Any]) -> bool:
+        """Return False if the queue is unavailable, the caller's work is
+        already committed then and the jobs are recovered by the worker sweep"""
+        if not payloads:
+            return True
+        try:
+            await self.repository.enqueue(name, *payloads)
+        except RedisError as e:
+            logger.warning(f"Jobs {name} are not enqueued: {e}")
+            return False
+        return True
+
+    async def process_items(self, *item_ids: UUID) -> bool:
+        return await self.enqueue(
+            "item.process", *({"item_id": str(item_id)} for item_id in item_ids)
+        )
@@ -0,0 +1,60 @@
+from typing import Any
+from uuid import UUID
+import hashlib
+import re
+
+from fastapi import Response
+from loguru import logger
+
+from app.db.tables import Item, ProcessingStatus
+from app.repositories.blob import BlobRepository
+from app.repositories.item import ItemRepository
+from app.repositories.job import settings
+from app.repositories.storage import StorageRepository
+from app.services.blob import BlobService
+from app.services.job import job_handler
+
+_DIGEST_PATTERN = re.compile("[0-9a-f]{64}")
+
+
+async def _mark_failed(payload: dict[str, Any]):
+    async with ItemRepository(response=Response()) as repository:
+        await repository.finish_processing(
+            UUID(payload["item_id"]), ProcessingStatus.failed
+        )
+
+
+@job_handler("item.process", on_failure=_mark_failed)
+async def process_item(payload: dict[str, Any]):
+    """Verify the stored content against the digest taken at upload.
+    Further processing of new items belongs here"""
+    item_id = UUID(payload["item_id"])
+    async with ItemRepository(response=Response()) as repository:
+        item = await repository.start_processing(item_id, settings.job_lease_timeout)
+        if item is None:  # Deleted, processed or claimed by another job
+            return
+        try:
+            processing_status = await _verify(repository, item)
+        except Exception:
+            await repository.release_processing(item_id)
+            raise
+        await repository.finish_processing(item_id, processing_status)
+
+
+async def _verify(repository: ItemRepository, item: Item) -> ProcessingStatus:
+    blob_service = BlobService(
+        BlobRepository(response=repository.response, session=repository.session),
+        StorageRepository(),
+    )
+    stored = await blob_service.stat(item.blob_id, item.codec)
+    if stored is None:
+        logger.error(f"Content of item {item.id} is missing")
+        return ProcessingStatus.failed
+    if _DIGEST_PATTERN.fullmatch(item.blob_id):  # Legacy ids aren't digests
+        digest = hashlib.sha256()
+        async for chunk in stored.read(0, None):
+            digest.update(chunk)
+        if digest.hexdigest() != item.blob_id:
+            logger.error(f"Content of item {item.id} is corrupted")
+            return ProcessingStatus.failed
+    return ProcessingStatus.done
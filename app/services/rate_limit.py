@@ -0,0 +1,124 @@
+from math import ceil
+from typing import AsyncIterator
+import asyncio
+
+from fastapi import Depends, HTTPException, Request, status
+from loguru import logger
+from redis.exceptions import RedisError
+
+from app.db.tables import User
+from app.dependencies import get_current_user
+from app.repositories.rate_limit import Bucket, RateLimitRepository, settings
+
+
+class Throttle:
+    """Bandwidth limit of a stream. Bytes are taken after they are sent,
+    going into debt, and the stream sleeps until the debt is paid off.
+    Small chunks are taken together to save round trips"""
+
+    min_take = 256 * 1024
+
+    def __init__(self, repository: RateLimitRepository, buckets: list[Bucket]):
+        self.repository = repository
+        self.buckets = buckets
+        self._pending = 0
+
+    async def consume(self, size: int) -> None:
+        self._pending += size
+        if self._pending < self.min_take:
+            return
+        amount, self._pending = self._pending, 0
+        try:
+            wait = await self.repository.take(self.buckets, amount, debt=True)
+        except RedisError as e:
+            logger.warning(f"Bandwidth isn't limited: {e}")
+            return
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def iterate(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            yield chunk
+            await self.consume(len(chunk))
+
+
+class RateLimitService:
+    """Token buckets per user and optionally per client address, limits are
+    shared by all workers through Redis and aren't applied when it's
+    unavailable"""
+
+    def __init__(self, repository: RateLimitRepository = Depends()):
+        self.repository = repository
+
+    @staticmethod
+    def _buckets(
+        kind: str, rate: float, burst: float, user_id: int, client: str | None
+    ) -> list[Bucket]:
+        buckets = [(f"{kind}:user:{user_id}", rate, burst)]
+        if client is not None:
+            factor = settings.rate_limit_ip_factor
+            buckets.append((f"{kind}:ip:{client}", rate * factor, burst * factor))
+        return buckets
+
+    async def check_request(self, user_id: int, client: str | None) -> None:
+        """429 when the user or the address sends requests too fast"""
+        buckets = self._buckets(
+            "requests",
+            settings.rate_limit_requests,
+            settings.rate_limit_requests_burst,
+            user_id,
+            client,
+        )
+        try:
+            wait = await self.repository.take(buckets, 1, debt=False)
+        except RedisError as e:
+            logger.warning(f"Requests aren't limited: {e}")
+            return
+        if wait > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(ceil(wait))},
+            )
+
+    def get_throttle(self, user_id: int, client: str | None) -> Throttle | None:
+        if settings.rate_limit_bandwidth is None:
+            return None
+        buckets = self._buckets(
+            "bytes",
+            settings.rate_limit_bandwidth,
+            settings.rate_limit_bandwidth_burst,
+            user_id,
+            client,
+        )
+        return Throttle(self.repository, buckets)
+
+    @staticmethod
+    def _client(request: Request) -> str | None:
+        if not settings.rate_limit_per_ip or request.client is None:
+            return None
+        return request.client.host
+
+    @classmethod
+    def limit_requests(cls):
+        async def validator(
+            request: Request,
+            user: User = Depends(get_current_user),
+            self: RateLimitService = Depends(cls),
+        ):
+            if settings.rate_limit_enabled:
+                await self.check_request(user.id, self._client(request))
+
+        return Depends(validator)
+
+    @classmethod
+    def throttle(cls):
+        async def dependency(
+            request: Request,
+            user: User = Depends(get_current_user),
+            self: RateLimitService = Depends(cls),
+        ) -> Throttle | None:
+            if not settings.rate_limit_enabled:
+                return None
+            return self.get_throttle(user.id, self._client(request))
+
+        return Depends(dependency)
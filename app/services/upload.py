@@ -0,0 +1,124 @@
+import datetime as dt
+from typing import AsyncIterator
+from fastapi import Depends, HTTPException, status
+from uuid import UUID, uuid4
+
+from app.schemas.item import ItemShortSchema
+from app.schemas.upload import UploadSessionCreateSchema, UploadSessionSchema
+from app.schemas.upload import UploadChunkSchema
+from app.repositories.item import ItemRepository
+from app.repositories.storage import StorageRepository
+from app.repositories.storage import settings as storage_settings
+from app.repositories.upload import UploadSessionRepository
+from app.services.access import UploadAccessService
+from app.services.blob import BlobService
+from app.services.job import JobService
+from app.services.usage import UsageService
+from app.db.tables import Item
+
+
+class UploadService:
+    def __init__(
+        self,
+        repository: UploadSessionRepository = Depends(),
+        item_repository: ItemRepository = Depends(),
+        access_service: UploadAccessService = Depends(),
+        storage_repository: StorageRepository = Depends(),
+        blob_service: BlobService = Depends(),
+        job_service: JobService = Depends(),
+        usage_service: UsageService = Depends(),
+    ):
+        self.repository = repository
+        self.item_repository = item_repository
+        self.access_service = access_service
+        self.storage_repository = storage_repository
+        self.blob_service = blob_service
+        self.job_service = job_service
+        self.usage_service = usage_service
+
+    async def create(self, schema: UploadSessionCreateSchema) -> UploadSessionSchema:
+        if schema.size > storage_settings.upload_session_max_size:
+            raise HTTPException(status_code=400, detail="File too large")
+        # Checked again on completion, the quota may be used up meanwhile
+        remaining = await self.usage_service.get_remaining(
+            self.access_service.current_user.id
+        )
+        if remaining is not None and schema.size > remaining:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Storage quota exceeded",
+            )
+        await self.delete_expired()
+        model = await self.repository.create(
+            ttl=dt.timedelta(seconds=storage_settings.upload_session_ttl),
+            owner_id=self.access_service.current_user.id,
+            **schema.model_dump(),
+        )
+        await self.storage_repository.create_staging(str(model.id), model.size)
+        return UploadSessionSchema.model_validate(model)
+
+    async def get_one(self, session_id: UUID) -> UploadSessionSchema:
+        model = await self.repository.get_one(session_id)
+        schema = UploadSessionSchema.model_validate(model)
+        schema.received = await self.repository.get_received_ranges(session_id)
+        return schema
+
+    async def write_chunk(
+        self, session_id: UUID, offset: int, stream: AsyncIterator[bytes]
+    ) -> UploadChunkSchema:
+        model = await self.repository.get_one(session_id)
+        # Don't hold the connection while the chunk is being received
+        await self.repository.commit()
+        if offset < 0 or offset >= model.size:
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+            )
+        limit = min(model.size - offset, storage_settings.upload_chunk_max_size)
+        size = await self.storage_repository.write_staging(
+            str(session_id), offset, stream, limit
+        )
+        await self.repository.add_chunk(session_id, offset, size)
+        return UploadChunkSchema(offset=offset, size=size)
+
+    async def complete(self, session_id: UUID) -> ItemShortSchema:
+        model = await self.repository.get_one(session_id, for_update=True)
+        received = await self.repository.get_received_ranges(session_id)
+        if model.size > 0 and received != [(0, model.size)]:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail="Upload is incomplete"
+            )
+        digest, size = await self.storage_repository.digest_staging(str(session_id))
+        try:
+            codec = await self.blob_service.store(
+                str(session_id), digest, size, model.filename
+            )
+            await self.usage_service.charge(model.owner_id, size)
+            item = Item(
+                id=uuid4(),
+                name=model.name,
+                filename=model.filename,
+                owner_id=model.owner_id,
+                blob_id=digest,
+                size_bytes=size,
+                content_type=self.storage_repository.guess_content_type(model.filename),
+                codec=codec,
+            )
+            item = await self.item_repository.create(item, do_commit=False)
+            await self.repository.delete(session_id, do_commit=False)
+            await self.blob_service.commit()
+        except BaseException:
+            # Staging file is kept with the session, completion can be retried
+            await self.blob_service.discard()
+            raise
+        await self.storage_repository.delete_staging(str(session_id))
+        await self.job_service.process_items(item.id)
+        return ItemShortSchema.model_validate(item)
+
+    async def delete(self, session_id: UUID) -> None:
+        await self.repository.get_one(session_id)
+        await self.repository.delete(session_id)
+        await self.storage_repository.delete_staging(str(session_id))
+
+    async def delete_expired(self) -> None:
+        for session_id in await self.repository.delete_expired():
+            await self.storage_repository.delete_staging(str(session_id))
@@ -0,0 +1,56 @@
+from collections import defaultdict
+from typing import Iterable
+
+from fastapi import Depends, HTTPException, status
+
+from app.schemas.auth import UserUsageSchema
+from app.repositories.storage import settings as storage_settings
+from app.repositories.user import UserRepository
+from app.db.tables import Item
+
+
+class UsageService:
+    """Storage usage counters of users, kept with the items instead of
+    summing sizes. Callers commit, so counters change with the items.
+    The user row is locked after the blob rows in every transaction,
+    and late, so it isn't held while the content is stored"""
+
+    def __init__(self, repository: UserRepository = Depends()):
+        self.repository = repository
+
+    async def get_usage(self, user_id: int) -> UserUsageSchema:
+        model = await self.repository.get_usage(user_id)
+        quota = model.quota_bytes
+        if quota is None:
+            quota = storage_settings.storage_user_quota
+        return UserUsageSchema(
+            used_bytes=model.used_bytes,
+            item_count=model.item_count,
+            quota_bytes=quota,
+        )
+
+    async def get_remaining(self, user_id: int) -> int | None:
+        """Bytes the user can still store, None for no quota"""
+        usage = await self.get_usage(user_id)
+        if usage.quota_bytes is None:
+            return None
+        return max(usage.quota_bytes - usage.used_bytes, 0)
+
+    async def charge(self, user_id: int, size_bytes: int, item_count: int = 1):
+        if not await self.repository.charge(
+            user_id, size_bytes, item_count, storage_settings.storage_user_quota
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Storage quota exceeded",
+            )
+
+    async def refund(self, items: Iterable[Item]) -> None:
+        """Take deleted items off the counters of their owners"""
+        usages: dict[int, list[int]] = defaultdict(lambda: [0, 0])
+        for item in items:
+            usages[item.owner_id][0] += item.size_bytes or 0
+            usages[item.owner_id][1] += 1
+        for owner_id in sorted(usages):  # Same lock order in every transaction
+            size_bytes, item_count = usages[owner_id]
+            await self.repository.charge(owner_id, -size_bytes, -item_count)
@@ -0,0 +1,101 @@
+"""Background job worker: python -m app.worker"""
+
+from time import monotonic
+import asyncio
+import os
+import signal
+import socket
+
+from fastapi import Response
+from loguru import logger
+
+from app.repositories.blob import BlobRepository
+from app.repositories.item import ItemRepository
+from app.repositories.job import Job, JobRepository, settings
+from app.repositories.storage import StorageRepository
+from app.services.blob import BlobService
+from app.services.job import handlers
+import app.services.processing  # noqa: F401 (registers job handlers)
+
+
+class Worker:
+    def __init__(self, repository: JobRepository | None = None):
+        self.repository = repository or JobRepository()
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._stopping = asyncio.Event()
+        self._next_sweep = 0.0
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run(self):
+        await self.repository.ensure_group()
+        logger.info(f"Worker {self.consumer} started")
+        while not self._stopping.is_set():
+            try:
+                await self._run_once()
+            except Exception as e:
+                logger.exception(e)
+                await asyncio.sleep(1)
+        logger.info(f"Worker {self.consumer} stopped")
+
+    async def _run_once(self):
+        await self.repository.move_due()
+        if monotonic() >= self._next_sweep:
+            await self._sweep()
+            self._next_sweep = monotonic() + settings.job_sweep_interval
+        jobs = await self.repository.claim_stale(self.consumer, settings.job_batch_size)
+        if not jobs:
+            jobs = await self.repository.read(
+                self.consumer, settings.job_batch_size, settings.job_block_timeout
+            )
+        await asyncio.gather(*(self.handle(job) for job in jobs))
+
+    async def handle(self, job: Job):
+        handler = handlers.get(job.name)
+        if handler is None:
+            logger.error(f"No handler for job {job.name}, dropped")
+            await self.repository.ack(job)
+            return
+        try:
+            await handler.func(job.payload)
+        except Exception as e:
+            if job.attempt + 1 < settings.job_max_attempts:
+                delay = await self.repository.retry(job)
+                logger.warning(f"Job {job.name} failed, retry in {delay:.1f}s: {e}")
+                return
+            logger.exception(f"Job {job.name} failed after {job.attempt + 1} attempts")
+            await self.repository.bury(job)
+            if handler.on_failure is not None:
+                await handler.on_failure(job.payload)
+            return
+        await self.repository.ack(job)
+
+    async def _sweep(self):
+        """Enqueue items whose jobs were lost, e.g. when Redis was unavailable
+        after the upload committed or the worker died while processing.
+        An item is enqueued again only once its lease has expired"""
+        async with ItemRepository(response=Response()) as repository:
+            item_ids = await repository.lease_unprocessed(settings.job_lease_timeout)
+        if item_ids:
+            logger.info(f"Enqueue {len(item_ids)} unprocessed items")
+            await self.repository.enqueue(
+                "item.process", *({"item_id": str(item_id)} for item_id in item_ids)
+            )
+        # Released blobs whose content a request didn't get to remove
+        async with BlobRepository(response=Response()) as repository:
+            purged = await BlobService(repository, StorageRepository()).purge()
+        if purged:
+            logger.info(f"Purged {purged} unreferenced blobs")
+
+
+async def main():
+    worker = Worker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    await worker.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,52 @@
+"""Compare two benchmark results: python -m benchmarks.compare old.json new.json"""
+
+from pathlib import Path
+import argparse
+import json
+
+METRICS = (
+    ("throughput_rps", lambda s: s["throughput_rps"]),
+    ("throughput_mbps", lambda s: s["throughput_mbps"]),
+    ("p50_ms", lambda s: s["latency_ms"]["p50"]),
+    ("p99_ms", lambda s: s["latency_ms"]["p99"]),
+    ("errors", lambda s: s["errors"]),
+)
+
+
+def change(old: float | None, new: float | None) -> str:
+    if old is None or new is None:
+        return "n/a"
+    if old == 0:
+        return "=" if new == 0 else "new"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    lines = [f"{'scenario':<10}{'metric':<18}{'old':>12}{'new':>12}{'change':>10}"]
+    for name, new_summary in new["scenarios"].items():
+        old_summary = old["scenarios"].get(name)
+        if old_summary is None:
+            continue
+        for metric, get in METRICS:
+            old_value, new_value = get(old_summary), get(new_summary)
+            lines.append(
+                f"{name:<10}{metric:<18}{old_value or 0:>12.2f}{new_value or 0:>12.2f}"
+                f"{change(old_value, new_value):>10}"
+            )
+    for key in ("peak_mb", "end_mb"):
+        old_value, new_value = old["rss"][key], new["rss"][key]
+        lines.append(
+            f"{'rss':<10}{key:<18}{old_value:>12.1f}{new_value:>12.1f}"
+            f"{change(old_value, new_value):>10}"
+        )
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    args = parser.parse_args()
+    old, new = (json.loads(path.read_text()) for path in (args.old, args.new))
+    print(f"{old['meta']['revision']} -> {new['meta']['revision']}")
+    print("\n".join(compare(old, new)))
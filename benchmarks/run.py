@@ -0,0 +1,383 @@
+"""Load benchmark of the item API.
+
+Boots fastapi_app with uvicorn against the Postgres and Redis of
+benchmarks/docker-compose.yml and a temporary storage directory, runs the
+scenarios at the given concurrency and saves the results as JSON:
+
+    docker compose -f benchmarks/docker-compose.yml up -d
+    python -m benchmarks.run --concurrency 32 --requests 2000
+    python -m benchmarks.compare before.json after.json
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from uuid import uuid4
+import argparse
+import asyncio
+import datetime as dt
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import asyncpg
+import httpx
+import psutil
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ("upload", "download", "list", "update")
+UNITS = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3}
+
+
+@dataclass
+class Result:
+    scenario: str
+    requests: int = 0
+    errors: int = 0
+    bytes: int = 0
+    duration: float = 0
+    latencies: list[float] = field(default_factory=list, repr=False)
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> float | None:
+            if not latencies:
+                return None
+            return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "duration_s": round(self.duration, 3),
+            "throughput_rps": round(self.requests / self.duration, 1),
+            "throughput_mbps": round(self.bytes / self.duration / 1024**2, 2),
+            "latency_ms": {
+                "p50": percentile(0.5),
+                "p99": percentile(0.99),
+                "mean": statistics.fmean(latencies) * 1000 if latencies else None,
+                "max": latencies[-1] * 1000 if latencies else None,
+            },
+        }
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().upper()
+    for unit in sorted(UNITS, key=len, reverse=True):
+        if value.endswith(unit):
+            return int(float(value[: -len(unit)]) * UNITS[unit])
+    return int(value)
+
+
+def parse_mix(value: str) -> list[tuple[int, float]]:
+    """4KB:70,1MB:25,16MB:5 -> sizes with their weights"""
+    mix = []
+    for part in value.split(","):
+        size, _, weight = part.partition(":")
+        mix.append((parse_size(size), float(weight or 1)))
+    return mix
+
+
+class RssSampler:
+    """Peak resident memory of the server and its worker processes"""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.peak = 0
+        self.samples: list[int] = []
+
+    def sample(self) -> int:
+        rss = 0
+        for process in [self.process, *self.process.children(recursive=True)]:
+            try:
+                rss += process.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        self.peak = max(self.peak, rss)
+        self.samples.append(rss)
+        return rss
+
+    async def run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+
+class Benchmark:
+    def __init__(self, args: argparse.Namespace, client: httpx.AsyncClient):
+        self.args = args
+        self.client = client
+        self.mix = parse_mix(args.sizes)
+        self.payloads = {size: os.urandom(size) for size, _ in self.mix}
+        self.user_id: int | None = None
+        self.item_ids: list[str] = []
+        self.random = random.Random(args.seed)
+
+    async def login(self):
+        email = f"bench-{uuid4().hex[:8]}@example.com"
+        password = uuid4().hex
+        response = await self.client.post(
+            "/api/auth/register", json={"email": email, "password": password}
+        )
+        response.raise_for_status()
+        self.user_id = response.json()["id"]
+        response = await self.client.post(
+            "/api/auth/login", data={"username": email, "password": password}
+        )
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        self.client.headers["Authorization"] = f"Bearer {token}"
+
+    def payload(self) -> bytes:
+        sizes, weights = zip(*self.mix)
+        size = self.random.choices(sizes, weights)[0]
+        # Unique prefix, so every upload is stored instead of deduplicated
+        return (uuid4().bytes + self.payloads[size][16:])[:size]
+
+    async def scenario_upload(self) -> int:
+        content = self.payload()
+        response = await self.client.post(
+            "/api/item",
+            params={"name": "bench", "owner_id": self.user_id},
+            files={"item_raw": ("bench.bin", content, "application/octet-stream")},
+        )
+        response.raise_for_status()
+        self.item_ids.append(response.json()["id"])
+        return len(content)
+
+    async def scenario_download(self) -> int:
+        item_id = self.random.choice(self.item_ids)
+        size = 0
+        async with self.client.stream("GET", f"/api/item/{item_id}") as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_raw():
+                size += len(chunk)
+        return size
+
+    async def scenario_list(self) -> int:
+        response = await self.client.get("/api/item", params={"count": 100})
+        response.raise_for_status()
+        return len(response.content)
+
+    async def scenario_update(self) -> int:
+        item_id = self.random.choice(self.item_ids)
+        response = await self.client.patch(
+            f"/api/item/{item_id}", json={"name": f"bench-{uuid4().hex[:8]}"}
+        )
+        if response.status_code != 304:
+            response.raise_for_status()
+        return 0
+
+    async def run_scenario(self, name: str, count: int) -> Result:
+        operation = getattr(self, f"scenario_{name}")
+        result = Result(name)
+        remaining = count
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                result.requests += 1
+                start = perf_counter()
+                try:
+                    result.bytes += await operation()
+                except httpx.HTTPError:
+                    result.errors += 1
+                    continue
+                result.latencies.append(perf_counter() - start)
+
+        start = perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+        result.duration = perf_counter() - start
+        return result
+
+    async def seed(self, count: int):
+        """Items for download and update when upload didn't create them"""
+        for _ in range(count):
+            await self.scenario_upload()
+
+
+async def prepare_database(env: dict[str, str]):
+    """Create the benchmark database and the schema in it"""
+    host, _, port = env["POSTGRES_HOST"].partition(":")
+    connection = await asyncpg.connect(
+        host=host,
+        port=int(port or 5432),
+        user=env["POSTGRES_USER"],
+        password=env["POSTGRES_PASSWORD"],
+        database="postgres",
+    )
+    try:
+        exists = await connection.fetchval(
+            "SELECT 1 FROM pg_database WHERE datname = $1", env["POSTGRES_DB"]
+        )
+        if not exists:
+            await connection.execute(f'CREATE DATABASE "{env["POSTGRES_DB"]}"')
+    finally:
+        await connection.close()
+    subprocess.run(
+        [sys.executable, "-c", "from app.db.base import run_init_models as r; r()"],
+        cwd=ROOT,
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, server: subprocess.Popen):
+    for _ in range(100):
+        if server.poll() is not None:
+            raise RuntimeError("Server exited on start")
+        try:
+            await client.get("/api/openapi.json")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server didn't start")
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args: argparse.Namespace) -> dict:
+    storage_path = Path(tempfile.mkdtemp(prefix="cloud-storage-bench-"))
+    env = {
+        **os.environ,
+        "POSTGRES_HOST": args.postgres_host,
+        "POSTGRES_DB": args.postgres_db,
+        "POSTGRES_USER": args.postgres_user,
+        "POSTGRES_PASSWORD": args.postgres_password,
+        "REDIS_HOST": args.redis_host,
+        "REDIS_PORT": str(args.redis_port),
+        "STORAGE_BACKEND": "local",
+        "STORAGE_PATH": str(storage_path / "files"),
+        "STORAGE_STAGING_PATH": str(storage_path / "uploads"),
+        "AUTH_SECRET": os.environ.get("AUTH_SECRET", uuid4().hex),
+        # The load comes from one user, limits would turn it into 429s
+        "RATE_LIMIT_ENABLED": os.environ.get("RATE_LIMIT_ENABLED", "false"),
+        **dict(item.split("=", 1) for item in args.env),
+    }
+    await prepare_database(env)
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:fastapi_app",
+            "--port",
+            str(args.port),
+            "--workers",
+            str(args.workers),
+            "--no-access-log",
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    limits = httpx.Limits(max_connections=args.concurrency)
+    client = httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=120
+    )
+    results: dict[str, dict] = {}
+    try:
+        await wait_ready(client, server)
+        sampler = RssSampler(server.pid)
+        rss_start = sampler.sample()
+        sampling = asyncio.create_task(sampler.run())
+        benchmark = Benchmark(args, client)
+        await benchmark.login()
+        for name in args.scenarios:
+            if name in ("download", "update") and not benchmark.item_ids:
+                await benchmark.seed(args.seed_items)
+            result = await benchmark.run_scenario(name, args.requests)
+            results[name] = result.summary()
+            print(f"{name:>8}: {json.dumps(results[name])}")
+        sampling.cancel()
+        rss = {
+            "start_mb": round(rss_start / 1024**2, 1),
+            "peak_mb": round(sampler.peak / 1024**2, 1),
+            "end_mb": round(sampler.sample() / 1024**2, 1),
+        }
+    finally:
+        await client.aclose()
+        server.terminate()
+        server.wait()
+        shutil.rmtree(storage_path, ignore_errors=True)
+    return {
+        "meta": {
+            "time": dt.datetime.now(dt.UTC).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "rss": rss,
+        "scenarios": results,
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenarios",
+        type=lambda v: v.split(","),
+        default=list(SCENARIOS),
+        help="Comma-separated, run in the given order",
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="Per scenario")
+    parser.add_argument(
+        "--sizes", default="4KB:70,256KB:25,8MB:5", help="Upload sizes with weights"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seed-items", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--postgres-host", default="127.0.0.1:55432")
+    parser.add_argument("--postgres-db", default="cloud_storage_bench")
+    parser.add_argument("--postgres-user", default="postgres")
+    parser.add_argument("--postgres-password", default="password")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=56379)
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Setting for the server, e.g. STORAGE_READ_BUFFER_SIZE=262144",
+    )
+    parser.add_argument("--output", type=Path, help="JSON file for the results")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    output = args.output or ROOT / "benchmarks" / "results" / (
+        dt.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results saved to {output}")
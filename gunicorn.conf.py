@@ -0,0 +1,24 @@
+"""Loaded by gunicorn from the working directory"""
+
+import os
+import shutil
+
+# Proxies trusted to set X-Forwarded-For, so request.client is the client
+# behind them. Set it to the address of nginx, with "*" any client that
+# reaches the app directly can pick its address
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+def on_starting(server):
+    # Metrics of a previous run must not be merged into the new one
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
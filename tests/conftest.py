@@ -0,0 +1,84 @@
+import os
+
+# Read when the app modules are imported
+os.environ.setdefault("AUTH_SECRET", "test-secret")
+
+from fastapi import Response
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+import fakeredis
+import pytest
+
+from app.db.base import async_session, engine, init_models
+from app.db.create import settings as db_settings
+from app.db.tables import User
+from app.repositories import job
+from app.repositories.blob import BlobRepository
+from app.repositories.cache import RedisCache
+from app.repositories.item import ItemRepository
+from app.repositories.job import JobRepository
+from app.repositories.storage import StorageRepository
+from app.repositories.storage.memory import MemoryStorageBackend
+from app.repositories.user import UserRepository
+from app.services.access import ItemAccessService
+from app.services.blob import BlobService
+from app.services.item import ItemService
+from app.services.job import JobService
+from app.services.usage import UsageService
+
+
+@pytest.fixture
+async def db():
+    """Tables are created again for every test, see docker-compose.yml"""
+    if not db_settings.postgres_db.endswith("_test"):
+        pytest.skip("POSTGRES_DB isn't a *_test database")
+    await init_models()
+    yield
+    await engine.dispose()  # Connections are bound to the loop of the test
+
+
+@pytest.fixture
+async def session(db) -> AsyncSession:
+    async with async_session() as session:
+        yield session
+
+
+@pytest.fixture
+async def user(session) -> User:
+    model = User(email="user@example.com", hashed_password="", name="user")
+    session.add(model)
+    await session.commit()
+    return model
+
+
+@pytest.fixture
+def fake_redis(monkeypatch) -> Redis:
+    """Item cache and job queue on fakeredis"""
+    server = fakeredis.FakeAsyncRedis()
+    cache = RedisCache("item", connection_pool=server.connection_pool)
+    monkeypatch.setattr(ItemRepository, "cache", cache)
+    monkeypatch.setattr(job, "pool", server.connection_pool)
+    return server
+
+
+@pytest.fixture
+def storage(tmp_path) -> StorageRepository:
+    repository = StorageRepository()
+    repository.backend = MemoryStorageBackend()
+    repository.staging_path = tmp_path
+    return repository
+
+
+@pytest.fixture
+def item_service(session, storage, user, fake_redis) -> ItemService:
+    """Service of the user's requests, as wired by the routes"""
+    response = Response()
+    repository = ItemRepository(response, session)
+    return ItemService(
+        repository=repository,
+        access_service=ItemAccessService(repository, user),
+        storage_repository=storage,
+        blob_service=BlobService(BlobRepository(response, session), storage),
+        job_service=JobService(JobRepository()),
+        usage_service=UsageService(UserRepository(response, session)),
+    )
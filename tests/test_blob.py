@@ -0,0 +1,167 @@
+from io import BytesIO
+import asyncio
+
+from fastapi import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+import pytest
+
+from app.db.base import async_session
+from app.db.tables import Blob
+from app.repositories.blob import BlobRepository
+from app.repositories.storage import StorageRepository
+from app.services.blob import BlobService
+
+CONTENT = b"content"
+
+
+def blob_service(session: AsyncSession, storage: StorageRepository) -> BlobService:
+    return BlobService(BlobRepository(Response(), session), storage)
+
+
+@pytest.fixture
+def service(session, storage) -> BlobService:
+    return blob_service(session, storage)
+
+
+@pytest.fixture
+def stored_keys(storage, monkeypatch) -> list[str]:
+    """Keys of the files handed to the backend"""
+    keys = []
+    store_file = storage.backend.store_file
+
+    async def spy(key, path):
+        keys.append(key)
+        await store_file(key, path)
+
+    monkeypatch.setattr(storage.backend, "store_file", spy)
+    return keys
+
+
+async def store(service: BlobService, content: bytes = CONTENT) -> str:
+    staging_name, digest, size = await service.storage_repository.ingest(
+        BytesIO(content)
+    )
+    await service.store(staging_name, digest, size, "file.txt")
+    await service.commit()
+    await service.storage_repository.delete_staging(staging_name)
+    return digest
+
+
+async def get_blob(session: AsyncSession, blob_id: str) -> Blob | None:
+    return await session.get(Blob, blob_id, populate_existing=True)
+
+
+async def test_same_content_is_stored_once(service, session, storage, stored_keys):
+    digest = await store(service)
+    assert await store(service) == digest
+    assert (await get_blob(session, digest)).ref_count == 2
+    assert stored_keys == [digest]
+    assert storage.backend.objects[digest][0] == CONTENT
+
+
+async def test_release_removes_content_after_last_reference(service, session, storage):
+    digest = await store(service)
+    await store(service)
+    await service.release(digest)
+    await service.commit()
+    assert (await get_blob(session, digest)).ref_count == 1
+    assert digest in storage.backend.objects
+
+    await service.release(digest)
+    await service.commit()
+    assert await get_blob(session, digest) is None
+    assert digest not in storage.backend.objects
+
+
+async def test_unreferenced_blob_is_kept_until_purge(service, session, storage):
+    digest = await store(service)
+    await service.repository.release(digest)
+    await service.repository.commit()
+    assert (await get_blob(session, digest)).ref_count == 0
+    assert digest in storage.backend.objects
+
+    assert await service.purge() == 1
+    assert await get_blob(session, digest) is None
+    assert digest not in storage.backend.objects
+
+
+async def test_add_reference_refuses_unreferenced_blob(service, session):
+    digest = await store(service)
+    await service.repository.release(digest)
+    await service.repository.commit()
+    assert not await service.add_reference(digest)
+    assert not await service.add_reference("missing")
+    assert (await get_blob(session, digest)).ref_count == 0
+
+
+async def test_store_reuses_unreferenced_blob(service, session, stored_keys):
+    digest = await store(service)
+    await service.repository.release(digest)
+    await service.repository.commit()
+    await store(service)
+    assert (await get_blob(session, digest)).ref_count == 1
+    assert stored_keys == [digest, digest]  # Content may be gone, stored again
+
+
+async def test_purge_skips_locked_blobs(service, session, storage):
+    digest = await store(service)
+    await service.repository.release(digest)
+    await service.repository.commit()
+    async with async_session() as other_session:
+        # Upload of the same content, not committed yet
+        other = blob_service(other_session, storage)
+        await other.repository.acquire(digest, len(CONTENT))
+        assert await service.purge() == 0
+        await other.repository.commit()
+    assert await service.purge() == 0
+    assert (await get_blob(session, digest)).ref_count == 1
+    assert digest in storage.backend.objects
+
+
+async def test_add_reference_racing_release(service, session, storage):
+    digest = await store(service)
+    async with async_session() as other_session:
+        other = blob_service(other_session, storage)
+        await service.release(digest)
+        # Copy of the item waits for the delete, then finds no references
+        add_reference = asyncio.create_task(other.add_reference(digest))
+        await asyncio.sleep(0.2)
+        assert not add_reference.done()
+        await service.commit()
+        assert not await add_reference
+        await other.repository.commit()
+    # The purge after the commit skips the row if the copy still holds it
+    await service.purge()
+    assert await get_blob(session, digest) is None
+    assert digest not in storage.backend.objects
+
+
+async def test_add_reference_racing_purge(service, session, storage):
+    digest = await store(service)
+    await service.repository.release(digest)
+    await service.repository.commit()
+    async with async_session() as other_session:
+        other = blob_service(other_session, storage)
+        assert await service.repository.purge([digest]) == [digest]
+        assert not await other.add_reference(digest)
+        await service.repository.commit()
+        await other.repository.commit()
+    assert await get_blob(session, digest) is None
+
+
+async def test_store_racing_purge(service, session, storage):
+    digest = await store(service)
+    await service.repository.release(digest)
+    await service.repository.commit()
+    async with async_session() as other_session:
+        other = blob_service(other_session, storage)
+        # Content is removed while the purged row is locked
+        assert await service.repository.purge([digest]) == [digest]
+        await storage.delete(digest)
+        upload = asyncio.create_task(store(other))
+        await asyncio.sleep(0.2)
+        assert not upload.done()
+        await service.repository.commit()
+        assert await upload == digest
+    assert (await get_blob(session, digest)).ref_count == 1
+    assert storage.backend.objects[digest][0] == CONTENT
@@ -0,0 +1,79 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.repositories.cache import RedisCache
+
+
+@pytest.fixture
+def cache() -> RedisCache:
+    return RedisCache(
+        "test", connection_pool=fakeredis.FakeAsyncRedis().connection_pool
+    )
+
+
+async def test_get_or_load_caches_value(cache):
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        return {"name": "item"}
+
+    assert await cache.get_or_load("1", loader) == {"name": "item"}
+    assert await cache.get_or_load("1", loader) == {"name": "item"}
+    assert calls == 1
+
+
+async def test_load_racing_delete_is_not_cached(cache):
+    async def stale_loader():
+        # Row is read, then the writer commits and invalidates the key
+        await cache.delete("1")
+        return {"name": "old"}
+
+    assert await cache.get_or_load("1", stale_loader) == {"name": "old"}
+
+    async def loader():
+        return {"name": "new"}
+
+    assert await cache.get_or_load("1", loader) == {"name": "new"}
+
+
+async def test_waiters_load_when_leader_is_cancelled(cache):
+    started = asyncio.Event()
+
+    async def slow_loader():
+        started.set()
+        await asyncio.sleep(10)
+
+    async def loader():
+        return {"name": "item"}
+
+    leader = asyncio.create_task(cache.get_or_load("1", slow_loader))
+    await started.wait()
+    waiter = asyncio.create_task(cache.get_or_load("1", loader))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await waiter == {"name": "item"}
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+async def test_waiters_share_loader_error(cache):
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def failing_loader():
+        started.set()
+        await release.wait()
+        raise ValueError
+
+    leader = asyncio.create_task(cache.get_or_load("1", failing_loader))
+    await started.wait()
+    waiter = asyncio.create_task(cache.get_or_load("1", failing_loader))
+    await asyncio.sleep(0)
+    release.set()
+    for task in (leader, waiter):
+        with pytest.raises(ValueError):
+            await task
@@ -0,0 +1,81 @@
+from importlib.util import find_spec
+import os
+
+import pytest
+
+from app.repositories.storage import Codec, StoredObject, decompressed
+from app.repositories.storage.codecs import compressor
+
+CHUNK_SIZE = 64 * 1024
+
+codecs = pytest.mark.parametrize(
+    "codec",
+    [
+        Codec.gzip,
+        pytest.param(
+            Codec.zstd,
+            marks=pytest.mark.skipif(
+                find_spec("zstandard") is None, reason="zstandard isn't installed"
+            ),
+        ),
+    ],
+)
+
+
+def compress(content: bytes, codec: Codec) -> bytes:
+    compress = compressor(codec)
+    return compress.compress(content) + compress.flush()
+
+
+def stored_object(data: bytes, read_size: int) -> StoredObject:
+    async def read(start: int = 0, end: int | None = None):
+        for offset in range(0, len(data), read_size):
+            yield data[offset : offset + read_size]
+
+    return StoredObject(key="key", size=len(data), mtime=0, read=read)
+
+
+async def read_chunks(stored: StoredObject, *args) -> list[bytes]:
+    return [chunk async for chunk in stored.read(*args)]
+
+
+@codecs
+async def test_compressible_content_is_inflated_in_bounded_chunks(codec):
+    content = bytes(64 * 1024 * 1024)
+    data = compress(content, codec)
+    assert len(data) < 1024 * 1024
+    # The whole compressed blob in one read
+    stored = decompressed(
+        stored_object(data, len(data)), codec, len(content), CHUNK_SIZE
+    )
+    chunks = await read_chunks(stored)
+    assert max(len(chunk) for chunk in chunks) <= CHUNK_SIZE
+    assert sum(len(chunk) for chunk in chunks) == len(content)
+    assert not any(any(chunk) for chunk in chunks)
+
+
+@codecs
+@pytest.mark.parametrize("read_size", [1, 1000, 1024 * 1024])
+async def test_decompressed_content(codec, read_size):
+    content = os.urandom(100_000) + bytes(500_000) + os.urandom(100_000)
+    stored = decompressed(
+        stored_object(compress(content, codec), read_size),
+        codec,
+        len(content),
+        CHUNK_SIZE,
+    )
+    assert b"".join(await read_chunks(stored)) == content
+
+
+@codecs
+@pytest.mark.parametrize(
+    "start, end",
+    [(0, 0), (0, None), (CHUNK_SIZE - 1, CHUNK_SIZE), (650_000, None), (10, 699_999)],
+)
+async def test_decompressed_range(codec, start, end):
+    content = os.urandom(100_000) + bytes(500_000) + os.urandom(100_000)
+    stored = decompressed(
+        stored_object(compress(content, codec), 4096), codec, len(content), CHUNK_SIZE
+    )
+    expected = content[start : None if end is None else end + 1]
+    assert b"".join(await read_chunks(stored, start, end)) == expected
@@ -0,0 +1,76 @@
+from base64 import urlsafe_b64encode
+from time import time
+import json
+
+from fastapi import HTTPException
+import pytest
+
+from app.schemas.download import DownloadTokenSchema
+from app.services.download import DownloadService, _signature
+
+
+def make_schema(**kwargs) -> DownloadTokenSchema:
+    values = {
+        "blob_id": "a" * 64,
+        "filename": "report.pdf",
+        "content_type": "application/pdf",
+        "expires": int(time()) + 60,
+    }
+    return DownloadTokenSchema(**values | kwargs)
+
+
+def b64(data: bytes) -> str:
+    return urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def assert_forbidden(token: str) -> HTTPException:
+    with pytest.raises(HTTPException) as e:
+        DownloadService.verify(token)
+    assert e.value.status_code == 403
+    return e.value
+
+
+def test_sign_and_verify():
+    schema = make_schema(codec="gzip", size=100)
+    assert DownloadService.verify(DownloadService.sign(schema)) == schema
+
+
+def test_token_is_url_safe():
+    token = DownloadService.sign(make_schema(filename="a b/ü?.txt"))
+    assert all(c.isalnum() or c in "-_." for c in token)
+
+
+def test_tampered_payload():
+    token = DownloadService.sign(make_schema())
+    _, _, signature = token.partition(".")
+    payload = make_schema(blob_id="b" * 64).model_dump_json(exclude_none=True)
+    assert_forbidden(f"{b64(payload.encode())}.{signature}")
+
+
+def test_tampered_signature():
+    payload, _, signature = DownloadService.sign(make_schema()).partition(".")
+    flipped = "A" if signature[0] != "A" else "B"
+    assert_forbidden(f"{payload}.{flipped}{signature[1:]}")
+
+
+def test_signature_of_other_key():
+    payload, _, _ = DownloadService.sign(make_schema()).partition(".")
+    assert_forbidden(f"{payload}.{b64(b'0' * 32)}")
+
+
+@pytest.mark.parametrize(
+    "token", ["", ".", "no-signature", "!!!.!!!", "a.b.c", "€.€", "YQ.YQ"]
+)
+def test_malformed_token(token):
+    assert_forbidden(token)
+
+
+def test_signed_payload_of_other_schema():
+    # Signed by us, but not a download token
+    payload = b64(json.dumps({"blob_id": "a" * 64}).encode())
+    assert_forbidden(f"{payload}.{b64(_signature(payload))}")
+
+
+def test_expired():
+    token = DownloadService.sign(make_schema(expires=int(time()) - 1))
+    assert assert_forbidden(token).detail == "Link expired"
@@ -0,0 +1,36 @@
+from io import BytesIO
+
+from fastapi import HTTPException, UploadFile
+import pytest
+
+from app.schemas.item import ItemCreateSchema, ItemShortSchema
+from app.services.item import ItemService
+
+
+async def create(service: ItemService, content: bytes) -> ItemShortSchema:
+    owner_id = service.access_service.current_user.id
+    schema = ItemCreateSchema(name="item", owner_id=owner_id)
+    return await service.create(schema, UploadFile(BytesIO(content), filename="a"))
+
+
+async def assert_not_found(service: ItemService, item_id):
+    with pytest.raises(HTTPException) as e:
+        await service.get_one(item_id)
+    assert e.value.status_code == 404
+
+
+async def test_deleted_item_is_not_served_from_cache(item_service):
+    item = await create(item_service, b"content")
+    await item_service.get_one(item.id)  # Cached
+    await item_service.delete(item.id)
+    await assert_not_found(item_service, item.id)
+
+
+async def test_deleted_items_are_not_served_from_cache(item_service):
+    items = [await create(item_service, content) for content in (b"a", b"b")]
+    for item in items:
+        await item_service.get_one(item.id)
+    models = await item_service.repository.get_many_by_ids([i.id for i in items])
+    await item_service.delete_many(models)
+    for item in items:
+        await assert_not_found(item_service, item.id)
@@ -0,0 +1,103 @@
+from unittest.mock import AsyncMock
+
+from fastapi import HTTPException
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError
+import fakeredis
+import pytest
+
+from app.repositories import rate_limit
+from app.repositories.rate_limit import RateLimitRepository
+from app.services.rate_limit import RateLimitService, Throttle
+
+
+@pytest.fixture
+def redis(monkeypatch) -> Redis:
+    server = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(rate_limit, "pool", server.connection_pool)
+    return server
+
+
+@pytest.fixture
+def repository(redis) -> RateLimitRepository:
+    return RateLimitRepository()
+
+
+@pytest.fixture
+def broken_repository() -> RateLimitRepository:
+    repository = RateLimitRepository.__new__(RateLimitRepository)
+    repository.take = AsyncMock(side_effect=ConnectionError("Too many connections"))
+    return repository
+
+
+async def test_take_within_burst(repository):
+    buckets = [("test", 1, 3)]
+    for _ in range(3):
+        assert await repository.take(buckets, 1, debt=False) == 0
+    wait = await repository.take(buckets, 1, debt=False)
+    assert 0.9 < wait <= 1
+
+
+async def test_take_refills_at_rate(repository):
+    buckets = [("test", 1000, 10)]
+    await repository.take(buckets, 10, debt=False)
+    wait = await repository.take(buckets, 5, debt=False)
+    assert 0 < wait <= 0.005
+
+
+async def test_take_all_or_nothing_without_debt(repository):
+    user, ip = ("user", 1, 5), ("ip", 1, 2)
+    assert await repository.take([user, ip], 2, debt=False) == 0
+    assert await repository.take([user, ip], 1, debt=False) > 0
+    # The user bucket wasn't charged by the refused take
+    assert await repository.take([user], 3, debt=False) == 0
+
+
+async def test_take_with_debt(repository):
+    buckets = [("test", 10, 10)]
+    assert await repository.take(buckets, 30, debt=True) == pytest.approx(2, abs=0.01)
+    # Tokens were taken anyway, the next take waits for the debt too
+    assert await repository.take(buckets, 1, debt=False) > 2
+
+
+async def test_take_sets_expiry(repository, redis):
+    await repository.take([("test", 10, 10)], 5, debt=False)
+    assert 0 < await redis.pttl("rate:test") <= 1500
+
+
+async def test_check_request_raises_too_many_requests(repository, monkeypatch):
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_requests", 0.5)
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_requests_burst", 2)
+    service = RateLimitService(repository)
+    for _ in range(2):
+        await service.check_request(1, None)
+    with pytest.raises(HTTPException) as e:
+        await service.check_request(1, None)
+    assert e.value.status_code == 429
+    assert int(e.value.headers["Retry-After"]) >= 1
+
+
+async def test_check_request_fails_open(broken_repository):
+    await RateLimitService(broken_repository).check_request(1, "127.0.0.1")
+    broken_repository.take.assert_awaited_once()
+
+
+async def test_throttle_fails_open(broken_repository, monkeypatch):
+    sleep = AsyncMock()
+    monkeypatch.setattr("app.services.rate_limit.asyncio.sleep", sleep)
+    throttle = Throttle(broken_repository, [("bytes:user:1", 1, 1)])
+    await throttle.consume(Throttle.min_take)
+    broken_repository.take.assert_awaited_once()
+    sleep.assert_not_awaited()
+
+
+async def test_throttle_batches_small_chunks(repository, monkeypatch):
+    take = AsyncMock(return_value=0)
+    monkeypatch.setattr(repository, "take", take)
+    throttle = Throttle(repository, [("bytes:user:1", 1, 1)])
+    for _ in range(3):
+        await throttle.consume(Throttle.min_take // 4)
+    take.assert_not_awaited()
+    await throttle.consume(Throttle.min_take // 4)
+    take.assert_awaited_once()
+    assert take.await_args.args[1] == Throttle.min_take
@@ -0,0 +1,167 @@
+from base64 import urlsafe_b64encode
+from uuid import uuid4
+import datetime as dt
+import json
+
+from fastapi import HTTPException, Response
+import pytest
+
+from app.db.tables import Blob, Item
+from app.repositories.item import ItemRepository
+from app.repositories.user import UserRepository
+
+
+@pytest.fixture
+def repository(session) -> ItemRepository:
+    return ItemRepository(Response(), session)
+
+
+@pytest.fixture
+async def items(session, user) -> list[Item]:
+    """Items in the listing order: newest first, then by id.
+    Pairs of them are created at the same time"""
+    session.add(Blob(id="blob", size=0, ref_count=5))
+    start = dt.datetime(2024, 1, 1, 12, 0, 0, 123456)
+    models = [
+        Item(
+            id=uuid4(),
+            name=f"item {i}",
+            filename="file",
+            owner_id=user.id,
+            blob_id="blob",
+            created_at=start + dt.timedelta(seconds=i // 2),
+        )
+        for i in range(5)
+    ]
+    session.add_all(models)
+    await session.commit()
+    return sorted(models, key=lambda model: (model.created_at, model.id), reverse=True)
+
+
+def encode(values) -> str:
+    return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def test_cursor_round_trip():
+    repository = ItemRepository(Response(), None)
+    item = Item(id=uuid4(), created_at=dt.datetime(2024, 1, 1, 12, 0, 0, 123456))
+    cursor = repository._encode_cursor(item)
+    assert repository._decode_cursor(cursor) == [item.created_at, item.id]
+
+
+@pytest.mark.parametrize(
+    "repository_class, cursor",
+    [
+        (ItemRepository, "not a cursor"),
+        (ItemRepository, encode("2024-01-01")),
+        (ItemRepository, encode(None)),
+        (ItemRepository, encode(["2024-01-01T12:00:00"])),
+        (ItemRepository, encode(["2024-01-01T12:00:00", str(uuid4()), 1])),
+        (ItemRepository, encode(["yesterday", str(uuid4())])),
+        (ItemRepository, encode(["2024-01-01T12:00:00", "not a uuid"])),
+        (ItemRepository, encode([1, str(uuid4())])),
+        (UserRepository, encode(["1"])),
+    ],
+)
+def test_invalid_cursor(repository_class, cursor):
+    with pytest.raises(HTTPException) as e:
+        repository_class(Response(), None)._decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+async def get_page(repository: ItemRepository, **filters) -> tuple[list, str | None]:
+    repository.response = Response()
+    models = await repository.get_many(**filters)
+    return [model.id for model in models], repository.response.headers.get(
+        "X-Next-Cursor"
+    )
+
+
+async def test_cursor_pages(repository, items):
+    ids, cursor = await get_page(repository, count=2)
+    pages = [ids]
+    while cursor is not None:
+        ids, cursor = await get_page(repository, count=2, cursor=cursor)
+        pages.append(ids)
+    expected = [item.id for item in items]
+    assert pages == [expected[0:2], expected[2:4], expected[4:]]
+
+
+async def test_page_is_ignored_with_cursor(repository, items):
+    _, cursor = await get_page(repository, count=2)
+    ids, _ = await get_page(repository, count=2, page=5, cursor=cursor)
+    assert ids == [item.id for item in items[2:4]]
+
+
+async def test_no_cursor_with_order_by(repository, items):
+    ids, cursor = await get_page(repository, count=2, order_by=Item.name)
+    names = {item.id: item.name for item in items}
+    assert [names[item_id] for item_id in ids] == ["item 0", "item 1"]
+    assert cursor is None
+
+
+UPDATED_AT = dt.datetime(2024, 1, 1, 12, 0, 0, 500000)
+
+
+@pytest.fixture
+async def item(session, user, fake_redis) -> Item:
+    session.add(Blob(id="blob", size=0, ref_count=1))
+    model = Item(
+        id=uuid4(),
+        name="item",
+        filename="file",
+        owner_id=user.id,
+        blob_id="blob",
+        updated_at=UPDATED_AT,
+    )
+    session.add(model)
+    await session.commit()
+    return model
+
+
+async def update(repository: ItemRepository, item_id, **fields) -> Item:
+    repository.response = Response()
+    return await repository.update(item_id, **fields)
+
+
+async def test_update(repository, item):
+    model = await update(repository, item.id, name="renamed")
+    assert repository.response.status_code == 200
+    assert model.name == "renamed"
+    assert model.updated_at > UPDATED_AT
+
+
+@pytest.mark.parametrize("fields", [{"name": "item"}, {}])
+async def test_update_without_changes(repository, item, fields):
+    model = await update(repository, item.id, **fields)
+    assert repository.response.status_code == 304
+    assert model.name == "item"
+    assert model.updated_at == UPDATED_AT
+
+
+async def test_update_unmodified_since(repository, item):
+    # Precision of HTTP dates is a second
+    since = UPDATED_AT.replace(microsecond=0)
+    model = await update(repository, item.id, unmodified_since=since, name="renamed")
+    assert repository.response.status_code == 200
+    assert model.name == "renamed"
+
+
+async def test_update_modified_since(repository, item, session):
+    item_id = item.id
+    since = UPDATED_AT - dt.timedelta(seconds=1)
+    with pytest.raises(HTTPException) as e:
+        await update(repository, item_id, unmodified_since=since, name="renamed")
+    assert e.value.status_code == 412
+    await session.rollback()
+    model = await session.get(Item, item_id, populate_existing=True)
+    assert (model.name, model.updated_at) == ("item", UPDATED_AT)
+
+
+@pytest.mark.parametrize("unmodified_since", [None, UPDATED_AT])
+async def test_update_missing(repository, item, unmodified_since):
+    with pytest.raises(HTTPException) as e:
+        await update(
+            repository, uuid4(), unmodified_since=unmodified_since, name="renamed"
+        )
+    assert e.value.status_code == 404
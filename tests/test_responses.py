@@ -0,0 +1,188 @@
+from email.utils import formatdate
+from pathlib import Path
+
+from starlette.applications import Starlette
+from starlette.datastructures import Headers
+from starlette.routing import Route
+from starlette.testclient import TestClient
+import httpx
+import pytest
+
+from app.repositories.storage import StoredObject
+from app.repositories.storage.local import LocalStorageBackend
+from app.responses import RangeFileResponse, accepts_encoding
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        (None, False),
+        ("", False),
+        ("gzip", True),
+        ("deflate, gzip;q=0.5", True),
+        ("GZIP", True),
+        ("br", False),
+        ("*", True),
+        ("gzip;q=0", False),
+        ("gzip;q=0.0, br", False),
+        ("*, gzip;q=0", False),
+        ("gzip;q=0, *", False),
+        ("*;q=0, gzip", True),
+        ("*;q=0", False),
+        ("gzip;q=bad", False),
+    ],
+)
+def test_accepts_encoding(accept_encoding, expected):
+    assert accepts_encoding(accept_encoding, "gzip") is expected
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("bytes=0-9", [(0, 9)]),
+        ("bytes=90-", [(90, 99)]),
+        ("bytes=50-200", [(50, 99)]),
+        ("bytes=-10", [(90, 99)]),
+        ("bytes=-200", [(0, 99)]),
+        ("bytes=0-0, -1", [(0, 0), (99, 99)]),
+        ("BYTES = 0-0", [(0, 0)]),
+        ("bytes=-0", []),
+        ("bytes=100-", []),
+        ("bytes=100-200, -0", []),
+        ("bytes=100-, 0-0", [(0, 0)]),
+        ("bytes=5-4", None),
+        ("bytes=a-b", None),
+        ("bytes=-", None),
+        ("bytes=0", None),
+        ("bytes=", None),
+        ("bytes=0-1,", None),
+        ("items=0-9", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert RangeFileResponse._parse_range(header, 100) == expected
+
+
+def test_parse_range_of_empty_file():
+    assert RangeFileResponse._parse_range("bytes=0-", 0) == []
+    assert RangeFileResponse._parse_range("bytes=-1", 0) == []
+
+
+def test_parse_range_limits_range_count():
+    max_ranges = RangeFileResponse.max_ranges
+    specs = [f"{i}-{i}" for i in range(max_ranges + 1)]
+    header = "bytes=" + ",".join(specs[:max_ranges])
+    assert len(RangeFileResponse._parse_range(header, 100)) == max_ranges
+    header = "bytes=" + ",".join(specs)
+    assert RangeFileResponse._parse_range(header, 100) is None
+
+
+CONTENT = bytes(range(256)) * 4
+MTIME = 1_700_000_000
+
+
+def memory_object(content: bytes = CONTENT, size: int | None = None) -> StoredObject:
+    async def read(start: int = 0, end: int | None = None):
+        yield content[start : None if end is None else end + 1]
+
+    size = len(content) if size is None else size
+    return StoredObject(key="file.bin", size=size, mtime=MTIME, read=read)
+
+
+def local_object(path: Path, content: bytes = CONTENT) -> StoredObject:
+    path.write_bytes(content)
+    stored = LocalStorageBackend(path.parent).stat_path(path)
+    stored.mtime = MTIME
+    return stored
+
+
+@pytest.fixture(params=["memory", "local"])
+def stored(request, tmp_path) -> StoredObject:
+    if request.param == "memory":
+        return memory_object()
+    return local_object(tmp_path / "file.bin")
+
+
+def get(stored: StoredObject, **headers) -> httpx.Response:
+    app = Starlette(routes=[Route("/", lambda request: RangeFileResponse(stored))])
+    with TestClient(app) as client:
+        return client.get("/", headers=headers)
+
+
+@pytest.mark.parametrize(
+    "if_range, expected",
+    [
+        (None, True),
+        ("etag", True),
+        ("W/etag", False),
+        ('"other"', False),
+        (formatdate(MTIME, usegmt=True), True),
+        (formatdate(MTIME + 1, usegmt=True), False),
+        ("not a date", False),
+    ],
+)
+def test_if_range_matches(if_range, expected):
+    response = RangeFileResponse(memory_object())
+    etag = response.headers["etag"]
+    if if_range is not None:
+        if_range = if_range.replace("etag", etag)
+    headers = Headers({} if if_range is None else {"if-range": if_range})
+    assert response._if_range_matches(headers) is expected
+
+
+def test_whole_file(stored):
+    response = get(stored)
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+def test_single_range(stored):
+    response = get(stored, range="bytes=-10")
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 1014-1023/{len(CONTENT)}"
+    assert response.headers["content-length"] == "10"
+    assert response.content == CONTENT[-10:]
+
+
+def test_unsatisfiable_range(stored):
+    response = get(stored, range=f"bytes={len(CONTENT)}-")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+    assert response.content == b""
+
+
+def test_stale_if_range_sends_whole_file(stored):
+    response = get(stored, range="bytes=0-9", **{"if-range": '"other"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_multipart_ranges(stored):
+    ranges = [(0, 9), (500, 599), (1000, 1023)]
+    header = "bytes=" + ", ".join(f"{start}-{end}" for start, end in ranges)
+    response = get(stored, range=header)
+    assert response.status_code == 206
+    content_type, _, boundary = response.headers["content-type"].partition(
+        "; boundary="
+    )
+    assert content_type == "multipart/byteranges"
+    assert len(response.content) == int(response.headers["content-length"])
+
+    body = response.content.decode("latin-1")
+    parts = body.split(f"--{boundary}")
+    assert parts[0] == ""
+    assert parts[-1] == "--\r\n"
+    for (start, end), part in zip(ranges, parts[1:-1], strict=True):
+        head, _, data = part.partition("\r\n\r\n")
+        assert f"Content-Range: bytes {start}-{end}/{len(CONTENT)}" in head
+        assert data.encode("latin-1") == CONTENT[start : end + 1] + b"\r\n"
+
+
+def test_truncated_file_ends_the_response(tmp_path):
+    stored = local_object(tmp_path / "file.bin")
+    (tmp_path / "file.bin").write_bytes(CONTENT[:100])
+    response = get(stored)
+    assert response.headers["content-length"] == str(len(CONTENT))
+    assert response.content == CONTENT[:100]
@@ -0,0 +1,72 @@
+"""S3 backend against MinIO or another S3-compatible store, see
+tests/docker-compose.yml. Skipped when S3_ENDPOINT_URL isn't set"""
+
+from pathlib import Path
+from uuid import uuid4
+import os
+
+import pytest
+
+from app.repositories.storage import settings
+from app.repositories.storage.s3 import S3StorageBackend
+
+pytestmark = pytest.mark.skipif(
+    settings.s3_endpoint_url is None, reason="S3_ENDPOINT_URL isn't set"
+)
+
+PART_SIZE = 5 * 1024 * 1024  # Smallest part S3 accepts
+
+
+@pytest.fixture
+async def backend():
+    backend = S3StorageBackend(key_prefix=f"test-{uuid4().hex}/", part_size=PART_SIZE)
+    client = await backend.client()
+    try:
+        await client.create_bucket(Bucket=backend.bucket)
+    except client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+    yield backend
+    await backend.close()
+
+
+def write_file(path: Path, content: bytes) -> Path:
+    path.write_bytes(content)
+    return path
+
+
+async def read_all(backend: S3StorageBackend, key: str, *args) -> bytes:
+    return b"".join([chunk async for chunk in backend.read(key, *args)])
+
+
+async def test_store_and_read(backend, tmp_path):
+    content = os.urandom(1024)
+    path = write_file(tmp_path / "file", content)
+    await backend.store_file("key", path)
+    assert not path.exists()  # The file is consumed
+    assert await backend.exists("key")
+    stored = await backend.stat("key")
+    assert stored.size == len(content)
+    assert stored.path is None
+    assert b"".join([chunk async for chunk in stored.read(0, None)]) == content
+    assert await read_all(backend, "key", 10, 19) == content[10:20]
+    assert await read_all(backend, "key", 1000) == content[1000:]
+
+
+async def test_store_multipart(backend, tmp_path):
+    content = os.urandom(PART_SIZE * 2 + 1024)
+    await backend.store_file("key", write_file(tmp_path / "file", content))
+    assert (await backend.stat("key")).size == len(content)
+    assert await read_all(backend, "key") == content
+
+
+async def test_missing_key(backend):
+    assert not await backend.exists("missing")
+    assert await backend.stat("missing") is None
+    assert await read_all(backend, "missing") == b""
+
+
+async def test_delete(backend, tmp_path):
+    await backend.store_file("key", write_file(tmp_path / "file", b"content"))
+    await backend.delete("key")
+    assert await backend.stat("key") is None
+    await backend.delete("key")  # Missing objects are ignored
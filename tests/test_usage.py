@@ -0,0 +1,119 @@
+from io import BytesIO
+from unittest.mock import AsyncMock
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import func, select, update
+import pytest
+
+from app.db.tables import Blob, User
+from app.schemas.auth import UserUsageSchema
+from app.schemas.item import ItemBatchCreateSchema, ItemCreateSchema
+from app.schemas.item import ItemShortSchema
+from app.services.item import ItemService
+
+
+@pytest.fixture
+async def quota(session, user) -> int:
+    quota_bytes = 10
+    await session.execute(
+        update(User).where(User.id == user.id).values(quota_bytes=quota_bytes)
+    )
+    await session.commit()
+    return quota_bytes
+
+
+@pytest.fixture
+def owner_id(user) -> int:
+    return user.id  # Stays readable after rollbacks
+
+
+def upload(content: bytes) -> UploadFile:
+    return UploadFile(BytesIO(content), filename="file.txt")
+
+
+async def create(
+    service: ItemService, owner_id: int, content: bytes
+) -> ItemShortSchema:
+    schema = ItemCreateSchema(name="item", owner_id=owner_id)
+    return await service.create(schema, upload(content))
+
+
+async def get_usage(service: ItemService, owner_id: int) -> UserUsageSchema:
+    return await service.usage_service.get_usage(owner_id)
+
+
+async def assert_nothing_stored(service: ItemService, session, owner_id: int):
+    await session.rollback()  # As the request's session does
+    assert await session.scalar(select(func.count()).select_from(Blob)) == 0
+    assert service.storage_repository.backend.objects == {}
+    assert list(service.storage_repository.staging_path.iterdir()) == []
+    usage = await get_usage(service, owner_id)
+    assert (usage.used_bytes, usage.item_count) == (0, 0)
+
+
+async def test_upload_is_charged(item_service, owner_id, quota):
+    item = await create(item_service, owner_id, b"1234567")
+    assert item.size_bytes == 7
+    usage = await get_usage(item_service, owner_id)
+    assert (usage.used_bytes, usage.item_count, usage.quota_bytes) == (7, 1, quota)
+
+
+async def test_upload_over_quota_is_rejected(item_service, owner_id, quota, session):
+    with pytest.raises(HTTPException) as e:
+        await create(item_service, owner_id, b"x" * (quota + 1))
+    assert e.value.status_code == 413
+    await assert_nothing_stored(item_service, session, owner_id)
+
+
+async def test_upload_over_quota_used_up_meanwhile(
+    item_service, owner_id, quota, session
+):
+    # Another upload used the quota after it was read
+    item_service.usage_service.get_remaining = AsyncMock(return_value=quota)
+    await create(item_service, owner_id, b"x" * 4)
+    with pytest.raises(HTTPException) as e:
+        await create(item_service, owner_id, b"y" * 7)
+    assert e.value.status_code == 413
+    await session.rollback()
+    assert [blob.size for blob in await session.scalars(select(Blob))] == [4]
+    assert len(item_service.storage_repository.backend.objects) == 1
+    usage = await get_usage(item_service, owner_id)
+    assert (usage.used_bytes, usage.item_count) == (4, 1)
+
+
+async def test_batch_over_quota_is_rejected(item_service, owner_id, quota, session):
+    schema = ItemBatchCreateSchema(owner_id=owner_id)
+    with pytest.raises(HTTPException) as e:
+        await item_service.create_many(schema, [upload(b"a" * 6), upload(b"b" * 6)])
+    assert e.value.status_code == 413
+    await assert_nothing_stored(item_service, session, owner_id)
+
+
+async def test_quota_is_read_without_holding_a_connection(
+    item_service, owner_id, session
+):
+    ingest = item_service.storage_repository.ingest
+
+    async def spy(*args):
+        assert not session.in_transaction()
+        return await ingest(*args)
+
+    item_service.storage_repository.ingest = spy
+    await create(item_service, owner_id, b"content")
+
+
+async def test_delete_refunds_item_size(item_service, owner_id):
+    item = await create(item_service, owner_id, b"1234567")
+    await create(item_service, owner_id, b"123")
+    await item_service.delete(item.id)
+    usage = await get_usage(item_service, owner_id)
+    assert (usage.used_bytes, usage.item_count) == (3, 1)
+
+
+async def test_delete_of_shared_content_refunds_item_size(item_service, owner_id):
+    item = await create(item_service, owner_id, b"1234567")
+    await create(item_service, owner_id, b"1234567")  # Same blob
+    await item_service.delete(item.id)
+    usage = await get_usage(item_service, owner_id)
+    assert (usage.used_bytes, usage.item_count) == (7, 1)
+    assert len(item_service.storage_repository.backend.objects) == 1